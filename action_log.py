@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+
+# Batched, asynchronous writer for the actions table.
+#
+# log() only appends to an in-memory buffer. A background thread writes the
+# buffer in a single transaction every flush_interval seconds, or sooner once
+# batch_size entries are waiting, so a mutation no longer pays for a second
+# commit just to record itself. close() flushes whatever is left and must be
+# called before the application exits.
+#
+# Retention: once the table holds more than max_rows entries, the oldest rows are
+# rolled over into actions_archive (or deleted if archive is False), so
+# show_recent_actions always works on a small table.
+#
+# The writer needs a connection of its own that allows use from another thread
+# (check_same_thread=False), e.g. ConnectionManager.connect(). A batch that
+# cannot be written (e.g. the database is locked) stays buffered and is retried.
+class ActionLogWriter:
+    def __init__(self, conn, flush_interval=1.0, batch_size=200, max_rows=100000, archive=True):
+        self.conn = conn
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.archive = archive
+        self.buffer = []
+        self.written_since_prune = 0
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="action-log", daemon=True)
+        self.thread.start()
+
+    # Function to record an action; safe to call from any thread
+    def log(self, action):
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        with self.lock:
+            self.buffer.append((action, timestamp))
+            if len(self.buffer) >= self.batch_size:
+                self.wakeup.notify()
+
+    def _run(self):
+        with self.lock:
+            while not self.closed:
+                self.wakeup.wait(self.flush_interval)
+                if self.buffer:
+                    try:
+                        self._flush_locked()
+                    except sqlite3.Error:
+                        # e.g. the database stayed locked past the busy
+                        # timeout; the entries are written on a later tick
+                        pass
+
+    def _flush_locked(self):
+        entries, self.buffer = self.buffer, []
+        # Release the lock while writing so log() callers never wait on the disk
+        self.lock.release()
+        written = False
+        try:
+            with self.write_lock:
+                with self.conn:
+                    self.conn.executemany("INSERT INTO actions (action, timestamp) VALUES (?, ?)", entries)
+                written = True
+                self.written_since_prune += len(entries)
+                if self.written_since_prune >= max(1, self.max_rows // 10):
+                    self._prune()
+        finally:
+            self.lock.acquire()
+            if not written:
+                # Back in front of the entries logged meanwhile, for the next flush
+                self.buffer[:0] = entries
+
+    # Function to write all buffered entries now
+    def flush(self):
+        with self.lock:
+            if self.buffer:
+                self._flush_locked()
+
+    # Function to roll the oldest entries over so at most max_rows remain
+    def prune(self):
+        with self.write_lock:
+            return self._prune()
+
+    def _prune(self):
+        self.written_since_prune = 0
+        cutoff = self.conn.execute("SELECT id FROM actions ORDER BY id DESC LIMIT 1 OFFSET ?", (self.max_rows,)).fetchone()
+        if cutoff is None:
+            return 0
+        with self.conn:
+            if self.archive:
+                self.conn.execute("INSERT INTO actions_archive (id, action, timestamp) SELECT id, action, timestamp FROM actions WHERE id <= ?", cutoff)
+            removed = self.conn.execute("DELETE FROM actions WHERE id <= ?", cutoff).rowcount
+        return removed
+
+    # Function to stop the writer; flushes the remaining entries first
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.wakeup.notify()
+        self.thread.join()
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,120 @@
+import threading
+
+# Price analytics for the Analytics tab.
+#
+# All aggregation is done by SQLite: per-role statistics with GROUP BY and the
+# price histogram by bucketing prices in SQL, so only a handful of rows ever
+# reach Python. Charts are drawn with matplotlib's Agg backend on a background
+# thread into an RGBA buffer, which the Tk side turns into an image. Results are
+# cached against a data version number and only recomputed after the listings
+# have actually changed.
+
+
+def compute_stats(conn, bins=20):
+    roles = conn.execute('''SELECT COALESCE(user_role, ''), COUNT(*), AVG(price), MIN(price), MAX(price)
+                            FROM apartments WHERE price IS NOT NULL GROUP BY user_role ORDER BY COUNT(*) DESC''').fetchall()
+    low, high = conn.execute("SELECT MIN(price), MAX(price) FROM apartments WHERE price IS NOT NULL").fetchone()
+    if low is None:
+        return {"roles": roles, "histogram": [], "bin_width": 0}
+    width = (high - low) / bins or 1.0
+    counts = dict(conn.execute('''SELECT MIN(CAST((price - ?) / ? AS INTEGER), ?), COUNT(*)
+                                  FROM apartments WHERE price IS NOT NULL GROUP BY 1''', (low, width, bins - 1)).fetchall())
+    histogram = [(low + i * width, counts.get(i, 0)) for i in range(bins)]
+    return {"roles": roles, "histogram": histogram, "bin_width": width}
+
+
+# Function to return a data version for AnalyticsCache. It changes whenever
+# another connection commits (this process's writer, an import from the
+# command line, another instance), and only ever increases, as long as it is
+# always read from the same connection.
+def data_version(conn):
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+# Function to draw the charts off the Tk thread; returns (width, height, rgba bytes)
+def render_charts(stats, size=(9, 3.5), dpi=90):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=size, dpi=dpi)
+    canvas = FigureCanvasAgg(figure)
+    hist_axes = figure.add_subplot(1, 2, 1)
+    role_axes = figure.add_subplot(1, 2, 2)
+
+    if stats["histogram"]:
+        edges, counts = zip(*stats["histogram"])
+        hist_axes.bar(edges, counts, width=stats["bin_width"], align='edge', edgecolor='white')
+    hist_axes.set_title("Price distribution")
+    hist_axes.set_xlabel("Price")
+    hist_axes.set_ylabel("Listings")
+
+    if stats["roles"]:
+        names = [role or "(none)" for role, *_ in stats["roles"]]
+        averages = [avg for _, _, avg, _, _ in stats["roles"]]
+        role_axes.bar(names, averages)
+    role_axes.set_title("Average price by user role")
+    role_axes.set_ylabel("Price")
+
+    figure.tight_layout()
+    canvas.draw()
+    width, height = canvas.get_width_height()
+    return width, height, bytes(canvas.buffer_rgba())
+
+
+# Cache of the last computed statistics and rendered charts. refresh() runs the
+# queries and rendering on a thread with its own connection unless the cached
+# result is still current, and calls callback(result) on the Tk thread, where
+# result is (stats, (width, height, rgba)). Versions must only ever increase.
+# Instead of connect, fetch_stats can supply the statistics, e.g. a remote
+# store's stats(); when it returns None they are computed with connect.
+class AnalyticsCache:
+    def __init__(self, window, connect=None, fetch_stats=None):
+        self.window = window
+        self.connect = connect
+        self.fetch_stats = fetch_stats
+        self.version = None
+        self.result = None
+        self.pending = None
+
+    def refresh(self, version, callback, on_error=None):
+        if self.version == version and self.result is not None:
+            callback(self.result)
+            return
+        if self.pending is not None and self.pending["version"] == version:
+            self.pending["callbacks"].append((callback, on_error))
+            return
+        task = self.pending = {"version": version, "callbacks": [(callback, on_error)], "result": None, "error": None, "done": False}
+        threading.Thread(target=self._compute, args=(task,), name="analytics", daemon=True).start()
+        self.window.after(50, self._poll, task)
+
+    def _compute(self, task):
+        try:
+            stats = self.fetch_stats() if self.fetch_stats is not None else None
+            if stats is None:
+                stats = self._stats()
+            task["result"] = (stats, render_charts(stats))
+        except Exception as exc:
+            task["error"] = exc
+        finally:
+            task["done"] = True
+
+    def _stats(self):
+        conn = self.connect()
+        try:
+            return compute_stats(conn)
+        finally:
+            conn.close()
+
+    def _poll(self, task):
+        if not task["done"]:
+            self.window.after(50, self._poll, task)
+            return
+        if self.pending is task:
+            self.pending = None
+        if task["error"] is None and (self.version is None or task["version"] >= self.version):
+            self.version, self.result = task["version"], task["result"]
+        for callback, on_error in task["callbacks"]:
+            if task["error"] is None:
+                callback(task["result"])
+            elif on_error:
+                on_error(task["error"])
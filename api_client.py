@@ -0,0 +1,232 @@
+import http.client
+import json
+import threading
+from urllib.parse import urlencode, urlsplit
+
+from search_index import SEARCH_COLUMNS
+from validation import ValidationError
+
+# Client of the local HTTP API (api_server.py).
+#
+# RemoteStore has the methods of HousingStore that the GUI uses, so the GUI
+# runs against a shared server when HOUSING_API_URL is set (e.g.
+# http://127.0.0.1:8765) instead of opening the database itself. The conn
+# argument of the store methods is accepted and ignored; DB worker lanes are
+# given the RemoteStore as their "connection". Each thread keeps one
+# keep-alive HTTP connection. The server's validation errors are raised as
+# ValidationError, other failures as RemoteError.
+#
+# RemotePaginator is the KeysetPaginator counterpart: it remembers the cursor
+# the server returned for each visited page, and jumps to unvisited pages by
+# offset.
+
+
+class RemoteError(Exception):
+    pass
+
+
+# Function to encode the criteria of a ListingQuery as request parameters
+def query_params(listing_query):
+    values = {
+        'text': listing_query.text,
+        'role': listing_query.user_role,
+        'min_price': listing_query.min_price,
+        'max_price': listing_query.max_price,
+        'user_id': listing_query.user_id,
+        'has_images': {True: 'yes', False: 'no'}.get(listing_query.has_images),
+        'has_video': {True: 'yes', False: 'no'}.get(listing_query.has_video),
+        'sort': listing_query.sort,
+        'descending': '1' if listing_query.descending else None,
+    }
+    if listing_query.text and listing_query.text_columns != SEARCH_COLUMNS:
+        values['columns'] = ','.join(listing_query.text_columns)
+    return {name: value for name, value in values.items() if value not in (None, '')}
+
+
+def _listing_body(listing):
+    return {
+        'address': listing.address, 'price': listing.price, 'description': listing.description,
+        'images': listing.images, 'video': listing.video, 'user_role': listing.user_role, 'user_id': listing.user_id,
+        'media': [{name: getattr(record, name) for name in record.__slots__} for record in listing.media.values()],
+    }
+
+
+class RemoteStore:
+    # Duck-typed as a DB worker connection: there is no transaction to roll
+    # back, and a request in flight cannot be interrupted (its result is
+    # dropped as stale instead)
+    in_transaction = False
+
+    def __init__(self, url='http://127.0.0.1:8765', timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 8765
+        self.timeout = timeout
+        self._local = threading.local()
+        self.version = 0
+        health = self._request('GET', '/health')
+        self.fts_enabled = health['fts']
+        self.version = health['version']
+
+    def interrupt(self):
+        pass
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    # Function to send one request and return the decoded JSON response, or
+    # None for 404 when missing is allowed. A GET on a keep-alive connection
+    # the server has closed is retried once on a new connection.
+    def _request(self, method, path, params=None, body=None, missing=False):
+        target = path + ('?' + urlencode(params) if params else '')
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        for attempt in range(2 if method == 'GET' else 1):
+            conn = self._connection()
+            try:
+                conn.request(method, target, body=data, headers=headers)
+                response = conn.getresponse()
+                payload = json.loads(response.read() or b'null')
+                break
+            except (ConnectionError, http.client.HTTPException) as exc:
+                conn.close()
+                self._local.conn = None
+                if attempt or method != 'GET':
+                    raise RemoteError(f"The server at {self.host}:{self.port} is not reachable: {exc}") from exc
+        if response.status == 404 and missing:
+            return None
+        if response.status == 400:
+            raise ValidationError(payload['error'])
+        if response.status >= 400:
+            raise RemoteError(payload.get('error') if isinstance(payload, dict) else response.reason)
+        if isinstance(payload, dict) and 'version' in payload:
+            self.version = max(self.version, payload['version'])
+        return payload
+
+    # Mutations; each returns the stored row where there is one
+
+    def add_listing(self, listing, conn=None):
+        return tuple(self._request('POST', '/listings', body=_listing_body(listing))['listing'])
+
+    def update_listing(self, listing_id, listing, conn=None):
+        result = self._request('PUT', f'/listings/{listing_id}', body=_listing_body(listing), missing=True)
+        return tuple(result['listing']) if result else None
+
+    def change_address(self, listing_id, address, conn=None):
+        result = self._request('PATCH', f'/listings/{listing_id}', body={'address': address}, missing=True)
+        return tuple(result['listing']) if result else None
+
+    def delete_listing(self, listing_id, conn=None):
+        return 1 if self._request('DELETE', f'/listings/{listing_id}', missing=True) else 0
+
+    def reset(self, conn=None):
+        self._request('POST', '/reset')
+
+    # Queries
+
+    def compile(self, listing_query):
+        return listing_query.compile(use_fts=self.fts_enabled)
+
+    # Function to fetch one page of a query; returns the server's page dict
+    def page(self, listing_query, cursor=None, offset=0, limit=50, count=False):
+        params = query_params(listing_query)
+        params['limit'] = limit
+        if cursor is not None:
+            params['cursor'] = cursor
+        elif offset:
+            params['offset'] = offset
+        if count:
+            params['count'] = 1
+        return self._request('GET', '/listings', params)
+
+    # Function to stream every row of a query, a page at a time
+    def query(self, listing_query, conn=None, chunk_size=500):
+        cursor = None
+        while True:
+            page = self.page(listing_query, cursor, limit=chunk_size)
+            for row in page['items']:
+                yield tuple(row)
+            cursor = page['next']
+            if cursor is None:
+                return
+
+    def get_listing(self, listing_id, conn=None):
+        result = self._request('GET', f'/listings/{listing_id}', missing=True)
+        return tuple(result['listing']) if result else None
+
+    def get_media_details(self, listing_id, conn=None):
+        result = self._request('GET', f'/listings/{listing_id}', missing=True)
+        return [tuple(record) for record in result['media']] if result else []
+
+    def recent_actions(self, limit=100, conn=None):
+        return (tuple(row) for row in self._request('GET', '/actions', {'limit': limit})['items'])
+
+    # Function to ask the server for its version, which every client's
+    # mutations advance
+    def current_version(self):
+        return self._request('GET', '/health')['version']
+
+    def stats(self, bins=20, conn=None):
+        return self._request('GET', '/stats', {'bins': bins})
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RemotePaginator:
+    def __init__(self, store, page_size=10):
+        self.store = store
+        self.page_size = page_size
+        self.query = None
+        self.sort_key = 'id'
+        self.total = None
+        self.cursors = {0: None}
+
+    # Function to change the query shown; the total is counted again and all
+    # cursors become invalid
+    def set_query(self, listing_query, use_fts=True):
+        if self.query is None or query_params(listing_query) != query_params(self.query):
+            self.query = listing_query
+            self.sort_key = listing_query.sort or 'id'
+            self.reset()
+
+    def count(self):
+        if self.total is None:
+            self.total = self.store.page(self.query, limit=1, count=True)['total']
+        return self.total
+
+    def total_pages(self):
+        return max(1, (self.count() + self.page_size - 1) // self.page_size)
+
+    def clamp(self, page):
+        return max(0, min(page, self.total_pages() - 1))
+
+    def fetch_page(self, page):
+        page = self.clamp(page)
+        cursor = self.cursors.get(page)
+        offset = 0 if page in self.cursors else page * self.page_size
+        result = self.store.page(self.query, cursor, offset, self.page_size)
+        if result['next'] is not None:
+            self.cursors[page + 1] = result['next']
+        return page, [tuple(row) for row in result['items']]
+
+    # The mutation handlers' calls; other clients change the listings too, so
+    # the server is asked again rather than adjusting the cached state
+    def note_insert(self, row_id, sort_value=None):
+        self.reset()
+
+    def note_delete(self, row_id, sort_value=None):
+        self.reset()
+
+    def note_update(self, row_id, old_sort_value=None, new_sort_value=None):
+        self.reset()
+
+    def reset(self, total=None):
+        self.total = total
+        self.cursors = {0: None}
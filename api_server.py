@@ -0,0 +1,544 @@
+import asyncio
+import base64
+import ipaddress
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from housing_store import ListingInput
+from listing_query import SORT_COLUMNS, ListingQuery
+from media_store import IngestedMedia
+from search_index import SEARCH_COLUMNS
+from validation import ValidationError
+
+# Local HTTP API over the listings database, for several staff members working
+# on one housing_extended.db at the same time.
+#
+# The server is the only process that writes. Every mutation is queued for a
+# single writer task, which runs whatever has queued up while the previous
+# batch was being committed as one transaction (group commit): each mutation
+# runs in its own SAVEPOINT, so a failing one is rolled back alone, and the
+# batch pays for one commit. Clients therefore never see "database is locked".
+# Reads run on a pool of read-only connections in parallel with the writer,
+# which WAL mode allows.
+#
+# Listing pages are JSON: {"columns": [...], "items": [[...], ...], "next":
+# cursor or null, "version": n}, plus "total" when asked for with count=1.
+# next is an opaque cursor for the following page: the last row's sort key, so
+# every page is an index seek (see ListingQuery.compile_page); relevance
+# ordered searches carry an offset instead. version counts the mutations the
+# server has committed, so clients can tell when what they show is stale.
+#
+#   GET    /health                      fts, version
+#   GET    /listings                    filters: text (columns) role min_price max_price user_id
+#                                       has_images has_video, sort descending, limit cursor offset count
+#   GET    /search?q=...                /listings with text, best matches first unless sorted
+#   GET    /listings/price?min_price=&max_price=   /listings sorted by price
+#   GET    /listings/<id>               {"listing": row, "media": [...]}
+#   POST   /listings                    add (JSON listing); PUT /listings/<id> update
+#   PATCH  /listings/<id>               {"address": ...}; DELETE /listings/<id>
+#   POST   /reset                       delete every listing
+#   GET    /actions?limit=              recent actions
+#   GET    /stats?bins=                 price statistics
+#   GET    /metrics                     request latency histograms (PerformanceMonitor)
+#
+#   python housing_cli.py serve [--host 127.0.0.1] [--port 8765] [--readers 4]
+#
+# There is no authentication: anyone who can connect may delete or reset the
+# listings. The command line therefore only binds to a loopback address unless
+# --allow-remote is given.
+MAX_PAGE_SIZE = 1000
+MAX_BODY = 1 << 20
+# SQLite integers are 64-bit; an offset past this is past any table, and
+# offset + limit still fits
+MAX_OFFSET = 1 << 62
+COLUMNS = list(SORT_COLUMNS)
+LISTING_FIELDS = ("address", "price", "description", "images", "video", "user_role", "user_id")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Whether a host name or address only accepts connections from this machine
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+# Function to decode a cursor of a page of query; returns {"after": key}
+# or {"offset": n}, as encoded by listings()
+def decode_cursor(cursor, query):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        position = None
+    if isinstance(position, dict):
+        after, offset = position.get('after'), position.get('offset')
+        if after is None and isinstance(offset, int) and 0 <= offset <= MAX_OFFSET:
+            return position
+        if (offset is None and isinstance(after, list) and len(after) == len(query.sort_key())
+                and all(value is None or isinstance(value, (str, float))
+                        or isinstance(value, int) and -MAX_OFFSET <= value <= MAX_OFFSET for value in after)):
+            return position
+    raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid cursor.")
+
+
+# Function to build the ListingQuery of a request's query string
+def listing_query(params, **defaults):
+    def get(name):
+        values = params.get(name)
+        return values[-1] if values else defaults.get(name, '')
+
+    columns = tuple(col for col in get('columns').split(',') if col) or SEARCH_COLUMNS
+    if not set(columns) <= set(SEARCH_COLUMNS):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"columns must be among {', '.join(SEARCH_COLUMNS)}.")
+    return ListingQuery.parse(get('text') or get('q'), get('role'), get('min_price'), get('max_price'), get('user_id'),
+                              get('has_images'), get('has_video'), sort=get('sort') or None,
+                              descending=get('descending').lower() in ('1', 'true', 'yes'), text_columns=columns)
+
+
+def _int_param(params, name, default, low=0, high=None):
+    try:
+        value = int(params.get(name, [default])[-1])
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer.")
+    return max(low, value if high is None else min(value, high))
+
+
+# Connection handed to store calls in a write batch: commits are deferred to
+# the end of the batch, and a rollback undoes only the current write's
+# savepoint
+class _BatchConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self._conn.execute("ROLLBACK TO write")
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class ApiServer:
+    def __init__(self, store, host='127.0.0.1', port=8765, readers=4, max_batch=256, monitor=None):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.monitor = monitor
+        self.version = 0
+        self.readers = [store.manager.connect(readonly=True) for _ in range(readers)]
+        self.read_executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="api-reader")
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-writer")
+        self.writer_conn = _BatchConnection(store.manager.writer())
+        self.routes = [
+            ('GET', re.compile(r"/health"), self.health),
+            ('GET', re.compile(r"/listings"), self.listings),
+            ('GET', re.compile(r"/search"), self.search),
+            ('GET', re.compile(r"/listings/price"), self.price_range),
+            ('GET', re.compile(r"/listings/(\d+)"), self.get_listing),
+            ('POST', re.compile(r"/listings"), self.add_listing),
+            ('PUT', re.compile(r"/listings/(\d+)"), self.update_listing),
+            ('PATCH', re.compile(r"/listings/(\d+)"), self.change_address),
+            ('DELETE', re.compile(r"/listings/(\d+)"), self.delete_listing),
+            ('POST', re.compile(r"/reset"), self.reset),
+            ('GET', re.compile(r"/actions"), self.actions),
+            ('GET', re.compile(r"/stats"), self.stats),
+            ('GET', re.compile(r"/metrics"), self.metrics),
+        ]
+        self.server = None
+        self.connections = {}
+        self.pool = None
+        self.heavy_reads = None
+        self.writes = None
+        self.writer_task = None
+        self.batches = 0
+        self.batched_writes = 0
+
+    # Reads: a connection is taken from the pool for the duration of one call.
+    # Text searches score or scan many rows; they hold at most all but one of
+    # the connections, so a burst of them never stalls page loads and details.
+
+    async def read(self, fn, heavy=False):
+        if heavy:
+            async with self.heavy_reads:
+                return await self.read(fn)
+        conn = await self.pool.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.read_executor, fn, conn)
+        finally:
+            self.pool.put_nowait(conn)
+
+    # Writes: fn(conn) is queued for the writer task; returns its result once
+    # the batch it ran in has been committed
+
+    async def write(self, fn):
+        future = asyncio.get_running_loop().create_future()
+        await self.writes.put((fn, future))
+        return await future
+
+    async def _writer_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.writes.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch and not self.writes.empty():
+                item = self.writes.get_nowait()
+                if item is None:
+                    self.writes.put_nowait(None)
+                    break
+                batch.append(item)
+            try:
+                results = await loop.run_in_executor(self.write_executor, self._run_batch, [fn for fn, _ in batch])
+            except Exception as exc:
+                results = [(None, exc)] * len(batch)
+            for (_, future), (result, error) in zip(batch, results):
+                if future.cancelled():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    # Runs on the writer thread: one transaction, one savepoint per write
+    def _run_batch(self, fns):
+        conn = self.writer_conn
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for fn in fns:
+                conn.execute("SAVEPOINT write")
+                try:
+                    result = fn(conn)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO write")
+                    results.append((None, exc))
+                else:
+                    results.append((result, None))
+                conn.execute("RELEASE write")
+            conn._conn.commit()
+        except BaseException:
+            conn._conn.rollback()
+            raise
+        self.version += sum(1 for _, error in results if error is None)
+        self.batches += 1
+        self.batched_writes += len(fns)
+        return results
+
+    # Endpoints; each returns a JSON-ready value or raises ApiError
+
+    async def health(self, request):
+        return {"fts": self.store.fts_enabled, "version": self.version, "batches": self.batches,
+                "batched_writes": self.batched_writes}
+
+    async def listings(self, request, **defaults):
+        query = listing_query(request.params, **defaults)
+        limit = _int_param(request.params, 'limit', 50, 1, MAX_PAGE_SIZE)
+        cursor = request.params.get('cursor', [None])[-1]
+        position = decode_cursor(cursor, query) if cursor else {}
+        after = position.get('after')
+        offset = position.get('offset', _int_param(request.params, 'offset', 0, 0, MAX_OFFSET))
+        count = request.params.get('count', ['0'])[-1] in ('1', 'true')
+        use_fts = self.store.fts_enabled
+
+        def fetch(conn):
+            rows = conn.execute(*query.compile_page(use_fts, after, offset, limit + 1)).fetchall()
+            total = None
+            if count:
+                where, params = query.where(use_fts)
+                total = conn.execute("SELECT COUNT(*) FROM apartments a" + (f" WHERE {where}" if where else ""),
+                                     params).fetchone()[0]
+            return rows, total
+
+        version = self.version
+        rows, total = await self.read(fetch, heavy=bool(query.text))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            if query.ranked(use_fts):
+                next_cursor = encode_cursor({"offset": offset + limit})
+            else:
+                next_cursor = encode_cursor({"after": list(query.key_of(rows[-1]))})
+        page = {"columns": COLUMNS, "items": rows, "next": next_cursor, "version": version}
+        if total is not None:
+            page["total"] = total
+        return page
+
+    async def search(self, request):
+        if not request.params.get('q', [''])[-1].strip():
+            raise ApiError(HTTPStatus.BAD_REQUEST, "q is required.")
+        return await self.listings(request)
+
+    async def price_range(self, request):
+        return await self.listings(request, sort='price')
+
+    async def get_listing(self, request, listing_id):
+        def fetch(conn):
+            return self.store.get_listing(int(listing_id), conn), self.store.get_media_details(int(listing_id), conn)
+
+        listing, media = await self.read(fetch)
+        if listing is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No listing with id {listing_id}.")
+        return {"listing": listing, "media": media}
+
+    def _listing_input(self, body):
+        if not isinstance(body, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Expected a JSON object.")
+        values = [body.get(field, '') for field in LISTING_FIELDS]
+        images = values[3] if isinstance(values[3], list) else [path for path in str(values[3]).split(',') if path]
+        listing = ListingInput.parse(str(values[0]), str(values[1]), str(values[2]), images, str(values[4] or ''),
+                                     str(values[5] or 'Student'), str(values[6]))
+        records = body.get('media') or []
+        if not (isinstance(records, list) and all(isinstance(record, dict) and isinstance(record.get('path'), str)
+                                                  for record in records)):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "media must be a list of objects with a path.")
+        media = {}
+        for record in records:
+            media[record['path']] = IngestedMedia(record.get('kind', 'image'), record.get('source'), record['path'],
+                                                  record.get('size'), record.get('width'), record.get('height'),
+                                                  record.get('content_hash'), record.get('web_path'),
+                                                  record.get('thumb_path'), record.get('duration'))
+        listing.media = media
+        return listing
+
+    async def add_listing(self, request):
+        listing = self._listing_input(request.json())
+        row = await self.write(lambda conn: self.store.add_listing(listing, conn))
+        return {"listing": row, "version": self.version}
+
+    # Function to wrap a write of one listing that returns None or 0 when
+    # there is no such listing: it fails with 404 instead, so its savepoint is
+    # rolled back and it does not count as a change
+    @staticmethod
+    def _existing(listing_id, fn):
+        def write(conn):
+            result = fn(conn)
+            if not result:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"No listing with id {listing_id}.")
+            return result
+        return write
+
+    async def update_listing(self, request, listing_id):
+        listing = self._listing_input(request.json())
+        row = await self.write(self._existing(listing_id, lambda conn: self.store.update_listing(int(listing_id), listing, conn)))
+        return {"listing": row, "version": self.version}
+
+    async def change_address(self, request, listing_id):
+        address = str((request.json() or {}).get('address', '')).strip()
+        if not address:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "New address is required.")
+        row = await self.write(self._existing(listing_id, lambda conn: self.store.change_address(int(listing_id), address, conn)))
+        return {"listing": row, "version": self.version}
+
+    async def delete_listing(self, request, listing_id):
+        await self.write(self._existing(listing_id, lambda conn: self.store.delete_listing(int(listing_id), conn)))
+        return {"deleted": int(listing_id), "version": self.version}
+
+    async def reset(self, request):
+        await self.write(lambda conn: self.store.reset(conn))
+        return {"version": self.version}
+
+    async def actions(self, request):
+        limit = _int_param(request.params, 'limit', 100, 1, MAX_PAGE_SIZE)
+        return {"items": await self.read(lambda conn: list(self.store.recent_actions(limit, conn)))}
+
+    async def stats(self, request):
+        bins = _int_param(request.params, 'bins', 20, 1, 1000)
+        return await self.read(lambda conn: self.store.stats(bins, conn))
+
+    async def metrics(self, request):
+        if self.monitor is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "The server was started without metrics.")
+        return self.monitor.snapshot()
+
+    # HTTP/1.1 with keep-alive; just enough for JSON requests and responses
+
+    async def _handle(self, reader, writer):
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    request = await _Request.read(reader)
+                except ApiError as exc:
+                    # The rest of the request cannot be told apart from the
+                    # next one, so the connection is closed after the answer
+                    await self._respond(writer, exc.status, {"error": str(exc)}, False)
+                    break
+                if request is None:
+                    break
+                start = time.perf_counter()
+                status, payload, name = await self._dispatch(request)
+                keep_alive = request.headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if self.monitor is not None:
+                    self.monitor.record('request', name, (time.perf_counter() - start) * 1000)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}"
+                     f"\r\n\r\n".encode('ascii') + body)
+        await writer.drain()
+
+    async def _dispatch(self, request):
+        methods = []
+        for method, pattern, handler in self.routes:
+            match = pattern.fullmatch(request.path)
+            if match is None:
+                continue
+            if method != request.method:
+                methods.append(method)
+                continue
+            name = f"{method} {pattern.pattern}"
+            try:
+                return HTTPStatus.OK, await handler(request, *match.groups()), name
+            except ApiError as exc:
+                return exc.status, {"error": str(exc)}, name
+            except ValidationError as exc:
+                return HTTPStatus.BAD_REQUEST, {"error": str(exc)}, name
+            except Exception as exc:
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"}, name
+        if methods:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"Use {', '.join(methods)}."}, "405"
+        return HTTPStatus.NOT_FOUND, {"error": f"No such endpoint: {request.path}"}, "404"
+
+    async def start(self):
+        self.pool = asyncio.Queue()
+        self.heavy_reads = asyncio.Semaphore(max(1, len(self.readers) - 1))
+        for conn in self.readers:
+            self.pool.put_nowait(conn)
+        self.writes = asyncio.Queue()
+        self.writer_task = asyncio.create_task(self._writer_loop())
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    # Function to stop accepting requests, close the client connections,
+    # finish the queued writes and close the read connections
+    async def stop(self):
+        self.server.close()
+        for writer in self.connections.values():
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+        await self.writes.put(None)
+        await self.writer_task
+        self.read_executor.shutdown()
+        self.write_executor.shutdown()
+        for conn in self.readers:
+            conn.close()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.stop()
+
+
+class _Request:
+    __slots__ = ('method', 'path', 'params', 'headers', 'body')
+
+    def __init__(self, method, path, params, headers, body):
+        self.method = method
+        self.path = path
+        self.params = params
+        self.headers = headers
+        self.body = body
+
+    # Function to read one request; returns None when the client closed the
+    # connection between requests
+    @classmethod
+    async def read(cls, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+            if len(headers) > 100:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Too many headers.")
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.")
+        if length > MAX_BODY:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large.")
+        body = await reader.readexactly(length) if length else b''
+        url = urlsplit(target)
+        return cls(method.upper(), unquote(url.path).rstrip('/') or '/', parse_qs(url.query), headers, body)
+
+    def json(self):
+        try:
+            return json.loads(self.body or b'null')
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid JSON body.")
+
+
+# Function to run a server on a background thread with its own event loop
+# (for tests, benchmarks and embedding); returns (server, stop function)
+def serve_in_thread(store, **options):
+    started = threading.Event()
+    holder = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        holder['loop'] = loop
+        server = holder['server'] = ApiServer(store, **options)
+        loop.run_until_complete(server.start())
+        started.set()
+        holder['task'] = loop.create_task(server.server.serve_forever())
+        try:
+            loop.run_until_complete(holder['task'])
+        except asyncio.CancelledError:
+            pass
+        loop.run_until_complete(server.stop())
+        loop.close()
+
+    thread = threading.Thread(target=run, name="api-server", daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        holder['loop'].call_soon_threadsafe(holder['task'].cancel)
+        thread.join()
+
+    return holder['server'], stop
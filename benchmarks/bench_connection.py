@@ -0,0 +1,120 @@
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_connection import ConnectionManager
+from migrations import migrate
+
+# Benchmark: commit latency and concurrent-read throughput with the stock sqlite3
+# defaults (rollback journal, synchronous=FULL) versus the tuned WAL settings of
+# ConnectionManager.
+#
+#   python benchmarks/bench_connection.py --rows 100000 --seconds 5 --readers 4
+
+
+def default_connect(database, readonly=False):
+    return sqlite3.connect(database, timeout=30, check_same_thread=False)
+
+
+def tuned_connect(manager):
+    return lambda database, readonly=False: manager.connect(readonly=readonly)
+
+
+def seed(conn, rows):
+    migrate(conn)
+    conn.executemany("INSERT INTO apartments (address, price, description, images, video, user_role, user_id) VALUES (?, ?, ?, '', '', ?, ?)",
+                     ((f"{i} Bench Street", 300 + i % 1700, f"listing {i}", "Student" if i % 3 else "Management", str(i)) for i in range(rows)))
+    conn.commit()
+
+
+def insert_one(conn, i):
+    conn.execute("INSERT INTO apartments (address, price, description, images, video, user_role, user_id) VALUES (?, ?, 'bench', '', '', 'Student', ?)",
+                 (f"{i} Commit Road", 500.0, str(i)))
+    conn.commit()
+
+
+def commit_latency(connect, database, commits):
+    conn = connect(database)
+    timings = []
+    for i in range(commits):
+        start = time.perf_counter()
+        insert_one(conn, i)
+        timings.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    return timings
+
+
+def concurrent_reads(connect, database, seconds, readers):
+    stop = threading.Event()
+    counts = [0] * readers
+    errors = []
+
+    def writer():
+        conn = connect(database)
+        i = 0
+        while not stop.is_set():
+            insert_one(conn, i)
+            i += 1
+        conn.close()
+
+    def reader(slot):
+        conn = connect(database, readonly=True)
+        last_id = 0
+        while not stop.is_set():
+            try:
+                rows = conn.execute("SELECT * FROM apartments WHERE id > ? ORDER BY id LIMIT 10", (last_id,)).fetchall()
+            except sqlite3.OperationalError as exc:
+                errors.append(exc)
+                continue
+            last_id = rows[-1][0] if len(rows) == 10 else 0
+            counts[slot] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(slot,)) for slot in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, len(errors)
+
+
+def run(label, connect, database, args):
+    conn = connect(database)
+    seed(conn, args.rows)
+    conn.close()
+    timings = commit_latency(connect, database, args.commits)
+    reads_per_second, errors = concurrent_reads(connect, database, args.seconds, args.readers)
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    print(f"{label:<8} commit mean {statistics.mean(timings):7.3f} ms  p95 {p95:7.3f} ms  |  "
+          f"{args.readers} readers: {reads_per_second:10.0f} pages/s  ({errors} lock errors)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Commit latency and concurrent-read throughput, default vs tuned connection settings")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--commits", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        before = os.path.join(directory, "before.db")
+        run("before", default_connect, before, args)
+
+        after = os.path.join(directory, "after.db")
+        manager = ConnectionManager(after)
+        run("after", tuned_connect(manager), after, args)
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_import import import_file
+from db_connection import ConnectionManager
+from migrations import migrate
+
+# Benchmark: bulk import throughput (rows/sec) on a generated CSV file.
+#
+#   python benchmarks/bench_import.py --rows 1000000 --batch-size 10000
+
+
+def generate_csv(path, rows):
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["ID", "Address", "Price", "Description", "Images", "Video", "User Role", "User ID"])
+        for i in range(rows):
+            writer.writerow([i, f"{i % 997} Maple Avenue, Apt {i % 40}", 250 + (i * 7919) % 2500,
+                             f"Furnished room {i} close to campus and public transport",
+                             f"media/{i}/front.jpg,media/{i}/kitchen.jpg", "",
+                             "Student" if i % 4 else "Management", str(100000 + i)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import throughput on a generated CSV file")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "listings.csv")
+        start = time.perf_counter()
+        generate_csv(csv_path, args.rows)
+        print(f"generated {args.rows} rows ({os.path.getsize(csv_path) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+        manager = ConnectionManager(os.path.join(directory, "import.db"))
+        conn = manager.writer()
+        migrate(conn)
+        start = time.perf_counter()
+        result = import_file(conn, csv_path, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{result.summary()} in {elapsed:.1f}s: {result.imported / elapsed:,.0f} rows/sec "
+              f"(batch size {args.batch_size})")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
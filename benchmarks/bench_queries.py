@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import dataset, parse_size
+from housing_store import HousingStore, ListingInput
+from listing_query import ListingQuery
+from pagination import KeysetPaginator
+from search_index import search_query
+
+# Benchmark: latency of every query the application issues, on the synthetic
+# databases of dataset.py. Each case runs until it has --runs samples or has
+# used --max-seconds; results are p50/p95/p99 in milliseconds, written as JSON
+# that can be compared with the result of another commit.
+#
+#   python benchmarks/bench_queries.py --rows 10k 100k --output after.json --baseline before.json
+#   python benchmarks/bench_queries.py --compare before.json after.json --threshold 0.2
+#
+# Every run works on a copy of the generated database, so the insert case does
+# not change the inputs of the next run.
+RESULT_VERSION = 1
+SEARCH_TERM = "balcony"
+PRICE_RANGE = (800, 900)
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings, rows):
+    timings = sorted(timings)
+    return {
+        "runs": len(timings),
+        "rows": rows,
+        "p50": round(percentile(timings, 0.50), 4),
+        "p95": round(percentile(timings, 0.95), 4),
+        "p99": round(percentile(timings, 0.99), 4),
+        "mean": round(sum(timings) / len(timings), 4),
+    }
+
+
+# Function to time fn() until runs samples are taken or max_seconds have passed
+# (at least min_runs). fn returns the number of rows it produced.
+def measure(fn, runs, max_seconds, min_runs=3):
+    fn()  # warm the page cache and sqlite3's statement cache
+    timings = []
+    rows = 0
+    deadline = time.perf_counter() + max_seconds
+    while len(timings) < runs and (len(timings) < min_runs or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        rows = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings, rows)
+
+
+def cases(store, directory):
+    conn = store.manager.reader()
+    total = conn.execute("SELECT COUNT(*) FROM apartments").fetchone()[0]
+    counter = iter(range(10 ** 9))
+
+    # A fresh paginator per run: the first visit to a page, as after start-up
+    def page(fraction, query=None):
+        def fetch():
+            paginator = KeysetPaginator(conn, 'apartments', 10)
+            if query is None:
+                paginator.total = total
+            else:
+                paginator.set_query(query, store.fts_enabled)
+            return len(paginator.fetch_page(int(paginator.total_pages() * fraction))[1])
+        return fetch
+
+    def consume(rows):
+        return sum(1 for _ in rows)
+
+    def export():
+        return store.export_csv(os.path.join(directory, "export.csv"))
+
+    def insert_and_log():
+        n = next(counter)
+        store.add_listing(ListingInput(f"{n} Benchmark Road", 650.0, "benchmark listing", (), "", "Student", str(n)))
+        store.action_log.flush()
+        return 1
+
+    return {
+        "page_shallow": page(0.0001),
+        "page_deep": page(0.9),
+        # a heading click: the first page of another order, then a jump deep into it
+        "sorted_page": page(0.0001, ListingQuery(sort="address", descending=True)),
+        "filtered_page": page(0.5, ListingQuery(SEARCH_TERM, "Student", *PRICE_RANGE, has_images=True, sort="price")),
+        # search_data's six-column LIKE, the fallback when FTS5 is unavailable
+        "search_like": lambda: consume(store.rows(*search_query(SEARCH_TERM, use_fts=False))),
+        "search_fts": lambda: consume(store.search(SEARCH_TERM)),
+        "advanced_search": lambda: consume(store.search(SEARCH_TERM, *PRICE_RANGE, columns=("address", "description"))),
+        "price_range": lambda: consume(store.by_price_range(*PRICE_RANGE)),
+        "role_filter": lambda: consume(store.by_role("Management")),
+        "export_csv": export,
+        "recent_actions": lambda: consume(store.recent_actions(100)),
+        "insert_and_log": insert_and_log,
+    }
+
+
+def run_size(rows, args):
+    source = dataset(rows, args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "housing.db")
+        shutil.copyfile(source, path)
+        store = HousingStore(path)
+        try:
+            for name, fn in cases(store, directory).items():
+                if args.only and name not in args.only:
+                    continue
+                results[name] = measure(fn, args.runs, args.max_seconds)
+                print(f"{rows:>8} {name:<16} p50 {results[name]['p50']:9.3f}  p95 {results[name]['p95']:9.3f}  "
+                      f"p99 {results[name]['p99']:9.3f} ms  ({results[name]['runs']} runs, {results[name]['rows']} rows)",
+                      file=sys.stderr)
+        finally:
+            store.close()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Function to compare two result files. A case regresses when its metric grew
+# by more than threshold (a fraction) and by more than min_delta milliseconds,
+# which keeps sub-millisecond noise from failing the check. Returns the list of
+# regressions as (size, case, before, after).
+def compare(baseline, current, metric="p50", threshold=0.2, min_delta=0.1, file=sys.stdout):
+    regressions = []
+    print(f"{'size':>8} {'case':<16} {'before':>10} {'after':>10} {'change':>8}  ({metric}, ms)", file=file)
+    for size, results in current["results"].items():
+        for name, result in results.items():
+            before = baseline["results"].get(size, {}).get(name)
+            if before is None:
+                continue
+            old, new = before[metric], result[metric]
+            change = (new - old) / old if old else 0.0
+            regressed = change > threshold and new - old > min_delta
+            if regressed:
+                regressions.append((size, name, old, new))
+            print(f"{size:>8} {name:<16} {old:10.3f} {new:10.3f} {change:+8.1%}{'  REGRESSION' if regressed else ''}", file=file)
+    return regressions
+
+
+def load(path):
+    with open(path) as file:
+        result = json.load(file)
+    if result.get("version") != RESULT_VERSION:
+        raise SystemExit(f"{path}: unsupported result version {result.get('version')}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency percentiles of the application's queries")
+    parser.add_argument("--rows", type=parse_size, nargs="+", default=[10000], help="10k, 100k, 1m or a number")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="time budget per case")
+    parser.add_argument("--only", nargs="+", help="run only these cases")
+    parser.add_argument("--output", help="write the results to this JSON file (default: stdout)")
+    parser.add_argument("--baseline", help="compare with this result file and fail on regressions")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="only compare two result files")
+    parser.add_argument("--metric", choices=["p50", "p95", "p99", "mean"], default="p50")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown as a fraction (0.2 = 20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.1, help="ignore slowdowns smaller than this many ms")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(load(args.compare[0]), load(args.compare[1]), args.metric, args.threshold, args.min_delta)
+        sys.exit(1 if regressions else 0)
+
+    current = {
+        "version": RESULT_VERSION,
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "seed": args.seed,
+        "results": {str(rows): run_size(rows, args) for rows in args.rows},
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        regressions = compare(load(args.baseline), current, args.metric, args.threshold, args.min_delta, file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
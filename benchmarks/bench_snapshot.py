@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_queries import PRICE_RANGE, measure
+from dataset import dataset, parse_size
+from analytics import compute_stats
+from db_connection import ConnectionManager
+from listing_query import ListingQuery
+from pagination import KeysetPaginator
+from price_snapshot import PriceSnapshot, SnapshotPaginator
+
+# Benchmark: the price snapshot (price_snapshot.py) against SQLite for
+# price-range filtering and the analytics statistics. Reported per dataset:
+# the time to load the snapshot, its memory footprint next to that of the same
+# listings fetched as tuple rows (traced with tracemalloc), and p50/p95/p99 of
+# each case both ways.
+#
+#   python benchmarks/bench_snapshot.py --rows 100k 1m
+#
+# The databases are only read, so the generated files are used directly.
+WIDE_RANGE = (0, 2000)
+
+
+# Function to measure the memory of a list of rows built by fn()
+def traced_size(fn):
+    tracemalloc.start()
+    try:
+        result = fn()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def cases(conn, snapshot):
+    # A fresh paginator per run, as when the filter is applied
+    def page(query, fraction, paginator_class):
+        def fetch():
+            paginator = KeysetPaginator(conn, 'apartments', 10)
+            if paginator_class is SnapshotPaginator:
+                paginator = SnapshotPaginator(paginator, snapshot)
+            paginator.set_query(query)
+            return len(paginator.fetch_page(int(paginator.total_pages() * fraction))[1])
+        return fetch
+
+    def materialize(query):
+        return lambda: len(conn.execute(*query.compile()).fetchall())
+
+    narrow = ListingQuery(min_price=PRICE_RANGE[0], max_price=PRICE_RANGE[1])
+    wide_role = ListingQuery(user_role="Student", min_price=WIDE_RANGE[0], max_price=WIDE_RANGE[1])
+    result = {}
+    for name, query in (("narrow", narrow), ("wide_role", wide_role),
+                        ("wide_role_by_price", wide_role.replace(sort='price', descending=True))):
+        result[f"{name}_rows"] = materialize(query)
+        for paginator_class, label in ((KeysetPaginator, "sql"), (SnapshotPaginator, "snapshot")):
+            result[f"{name}_first_page_{label}"] = page(query, 0.0, paginator_class)
+            result[f"{name}_deep_page_{label}"] = page(query, 0.9, paginator_class)
+    result["stats_sql"] = lambda: len(compute_stats(conn)["roles"])
+    result["stats_snapshot"] = lambda: len(snapshot.stats()["roles"])
+    return result
+
+
+def run_size(rows, args):
+    manager = ConnectionManager(dataset(rows, args.seed))
+    conn = manager.connect(readonly=True)
+    snapshot = PriceSnapshot()
+    start = time.perf_counter()
+    snapshot.load(conn)
+    results = {
+        "load_ms": round((time.perf_counter() - start) * 1000, 1),
+        "snapshot_bytes": snapshot.memory_usage()["total"],
+    }
+    if not args.skip_rows:
+        results["tuple_rows_bytes"] = traced_size(lambda: conn.execute("SELECT * FROM apartments").fetchall())
+    print(f"{rows:>8} snapshot loaded in {results['load_ms']:.0f} ms, {results['snapshot_bytes'] / 1e6:.1f} MB"
+          + (f" (tuple rows: {results['tuple_rows_bytes'] / 1e6:.1f} MB)" if 'tuple_rows_bytes' in results else ""),
+          file=sys.stderr)
+    for name, fn in cases(conn, snapshot).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(fn, args.runs, args.max_seconds)
+        print(f"{rows:>8} {name:<32} p50 {results[name]['p50']:9.3f}  p95 {results[name]['p95']:9.3f}  "
+              f"p99 {results[name]['p99']:9.3f} ms  ({results[name]['runs']} runs, {results[name]['rows']} rows)",
+              file=sys.stderr)
+    conn.close()
+    manager.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price snapshot against SQLite: memory and range-filter latency")
+    parser.add_argument("--rows", type=parse_size, nargs="+", default=[100000], help="10k, 100k, 1m or a number")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="time budget per case")
+    parser.add_argument("--only", nargs="+", help="run only these cases")
+    parser.add_argument("--skip-rows", action="store_true", help="do not measure the memory of tuple rows")
+    parser.add_argument("--output", help="write the results to this JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    current = {"sqlite": sqlite3.sqlite_version, "seed": args.seed,
+               "results": {str(rows): run_size(rows, args) for rows in args.rows}}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_import import import_records
+from db_connection import ConnectionManager
+from migrations import migrate
+
+# Deterministic synthetic housing_extended.db files for the benchmarks.
+#
+# The same (rows, seed) always gives byte-for-byte the same listings: addresses
+# built from street and city names, descriptions of 15-40 words drawn from a
+# housing vocabulary, 0-6 image paths and an occasional video, the roles in the
+# proportions the application sees, plus an action log. Generated files are
+# kept in benchmarks/data and reused.
+#
+#   python benchmarks/dataset.py --rows 100000
+SIZES = {"10k": 10000, "100k": 100000, "1m": 1000000}
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+STREETS = ["Maple", "Oak", "Cedar", "Elm", "Pine", "Birch", "Willow", "Chestnut", "Harbor", "College",
+           "University", "Station", "Mill", "Church", "Park", "Bridge", "King", "Queen", "Victoria", "Garden"]
+STREET_TYPES = ["Street", "Avenue", "Road", "Lane", "Boulevard", "Court", "Place", "Way"]
+CITIES = ["Leeds", "Manchester", "Bristol", "Nottingham", "Sheffield", "Glasgow", "Cardiff", "York", "Bath", "Exeter"]
+WORDS = ("bright spacious furnished unfurnished cozy modern quiet shared private double single ensuite room studio "
+         "flat apartment kitchen bathroom balcony garden parking bills included wifi heating laundry close to campus "
+         "library bus stop station shops gym near city centre walking distance available september short let "
+         "long let students only professionals welcome pets allowed no smoking newly renovated large windows "
+         "storage desk wardrobe dishwasher washing machine secure entry bike storage").split()
+ROLES = [("Student", 70), ("Management", 25), ("Other", 5)]
+
+
+def listing_records(rows, seed=0):
+    rng = random.Random(seed)
+    roles = [role for role, weight in ROLES for _ in range(weight)]
+    for i in range(rows):
+        images = [f"media/{i // 1000:04d}/{i}_{n}.jpg" for n in range(rng.randint(0, 6))]
+        yield {
+            "address": f"{rng.randint(1, 400)} {rng.choice(STREETS)} {rng.choice(STREET_TYPES)}, "
+                       f"Apt {rng.randint(1, 60)}, {rng.choice(CITIES)}",
+            "price": round(rng.lognormvariate(6.7, 0.45), 2),
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 40))),
+            "images": images,
+            "video": f"media/{i // 1000:04d}/{i}.mp4" if rng.random() < 0.1 else "",
+            "user_role": rng.choice(roles),
+            "user_id": str(1000000 + rng.randint(0, 9999999)),
+        }
+
+
+def action_rows(count, seed=0):
+    rng = random.Random(seed + 1)
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        verb = rng.choice(["Added apartment at", "Updated apartment at", "Deleted apartment with ID"])
+        yield (f"{verb} {rng.randint(1, 400)} {rng.choice(STREETS)} {rng.choice(STREET_TYPES)}",
+               (start + timedelta(seconds=37 * i)).strftime('%Y-%m-%d %H:%M:%S'))
+
+
+# Function to create a database with the given number of listings
+def generate(path, rows, seed=0, actions=None):
+    manager = ConnectionManager(path)
+    conn = manager.writer()
+    migrate(conn)
+    import_records(conn, listing_records(rows, seed), batch_size=20000)
+    conn.executemany("INSERT INTO actions (action, timestamp) VALUES (?, ?)",
+                     action_rows(min(rows, 50000) if actions is None else actions, seed))
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    manager.close()
+
+
+# Function to return the path of the generated database for a size, creating
+# it on first use
+def dataset(rows, seed=0, directory=DATA_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"housing-{rows}-{seed}.db")
+    if not os.path.exists(path):
+        temp_path = path + ".tmp"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(temp_path + suffix):
+                os.remove(temp_path + suffix)
+        generate(temp_path, rows, seed)
+        os.replace(temp_path, path)
+    return path
+
+
+def parse_size(value):
+    return SIZES.get(value.lower()) or int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic housing databases")
+    parser.add_argument("--rows", type=parse_size, nargs="+", default=[SIZES["10k"]], help="10k, 100k, 1m or a number")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for rows in args.rows:
+        start = time.perf_counter()
+        path = dataset(rows, args.seed)
+        print(f"{path}: {rows} listings, {os.path.getsize(path) / 1e6:.1f} MB ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_queries import summarize
+from dataset import CITIES, STREETS, WORDS, dataset, parse_size
+
+# Load test of the HTTP API (api_server.py): many simulated staff members using
+# one server at the same time. Every user holds a keep-alive connection and
+# loops over a mix of what the GUI does: browse the first page and follow the
+# next cursor a few pages deep, sorted by price or not; search; filter by a
+# price range; open a listing's details; and now and then add a listing or
+# change an address. Reported are p50/p95/p99 per request kind, throughput and
+# errors.
+#
+#   python benchmarks/load_test.py --rows 100k --users 50 --seconds 30
+#   python benchmarks/load_test.py --url http://127.0.0.1:8765 --users 20
+#
+# Without --url a server is started for the run (housing_cli.py serve, in its
+# own process) on a copy of the generated database.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, params=None, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        target = path + ('?' + urlencode(params) if params else '')
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.writer.write(f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(data)}\r\n"
+                          f"Content-Type: application/json\r\n\r\n".encode('ascii') + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# One simulated user: yields (kind, method, path, params, body) requests;
+# pages are followed with the cursor of the previous response
+def session(rng, rows, responses):
+    while True:
+        roll = rng.random()
+        if roll < 0.35:
+            params = {'limit': 10, 'count': 1}
+            if rng.random() < 0.5:
+                params.update(sort='price', descending='1' if rng.random() < 0.5 else '')
+            kind = 'page'
+            for _ in range(rng.randint(1, 4)):
+                yield kind, 'GET', '/listings', params, None
+                page = responses[-1]
+                if not page or not page.get('next'):
+                    break
+                params = dict(params, cursor=page['next'])
+                params.pop('count', None)
+                kind = 'next page'
+        elif roll < 0.60:
+            yield 'search', 'GET', '/search', {'q': rng.choice(WORDS)[:rng.randint(3, 6)], 'limit': 50}, None
+        elif roll < 0.80:
+            low = rng.randrange(300, 1500, 50)
+            yield 'price range', 'GET', '/listings/price', {'min_price': low, 'max_price': low + 100, 'limit': 50}, None
+        elif roll < 0.95:
+            yield 'details', 'GET', f'/listings/{rng.randint(1, rows)}', None, None
+        elif roll < 0.98:
+            body = {'address': f"{rng.randint(1, 300)} {rng.choice(STREETS)} Street, {rng.choice(CITIES)}",
+                    'price': rng.randrange(300, 2000), 'description': " ".join(rng.choices(WORDS, k=20)),
+                    'user_role': 'Student', 'user_id': str(rng.randint(100000, 999999))}
+            yield 'add', 'POST', '/listings', None, body
+        else:
+            body = {'address': f"{rng.randint(1, 300)} {rng.choice(STREETS)} Road, {rng.choice(CITIES)}"}
+            yield 'change address', 'PATCH', f'/listings/{rng.randint(1, rows)}', None, body
+
+
+async def user(host, port, seed, rows, deadline, think, timings, errors):
+    rng = random.Random(seed)
+    client = Client(host, port)
+    responses = [None]
+    try:
+        for kind, method, path, params, body in session(rng, rows, responses):
+            if time.perf_counter() >= deadline:
+                return
+            start = time.perf_counter()
+            try:
+                status, payload = await client.request(method, path, params, body)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as exc:
+                errors[kind] = errors.get(kind, 0) + 1
+                print(f"{kind}: {exc}", file=sys.stderr)
+                client.close()
+                client = Client(host, port)
+                responses.append(None)
+                continue
+            timings.setdefault(kind, []).append((time.perf_counter() - start) * 1000)
+            if status >= 400 and status != 404:
+                errors[kind] = errors.get(kind, 0) + 1
+            responses.append(payload if status == 200 else None)
+            if think:
+                await asyncio.sleep(rng.uniform(0, 2 * think))
+    finally:
+        client.close()
+
+
+async def run_load(host, port, users, seconds, think, rows, seed):
+    timings, errors = {}, {}
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(user(host, port, seed * 1000 + i, rows, deadline, think, timings, errors) for i in range(users)))
+    elapsed = time.perf_counter() - start
+    requests = sum(len(values) for values in timings.values())
+    return {
+        "users": users,
+        "seconds": round(elapsed, 2),
+        "requests": requests,
+        "throughput": round(requests / elapsed, 1),
+        "errors": errors,
+        "requests_by_kind": {kind: summarize(values, 0) for kind, values in sorted(timings.items())},
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# Function to start housing_cli.py serve on a database and wait until it answers
+def start_server(database, port, readers):
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "housing_cli.py"), "--database", database, "serve",
+                                "--port", str(port), "--readers", str(readers)], cwd=ROOT)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("The server exited during startup.")
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("The server did not start within 60 s.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-user load test of the HTTP API")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--rows", type=parse_size, default=100000, help="10k, 100k, 1m or a number")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between a user's requests, in seconds")
+    parser.add_argument("--readers", type=int, default=4, help="read connections of the started server")
+    parser.add_argument("--output", help="write the results to this JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 8765
+        else:
+            path = os.path.join(directory, "housing.db")
+            shutil.copyfile(dataset(args.rows, args.seed), path)
+            host, port = '127.0.0.1', _free_port()
+            process = start_server(path, port, args.readers)
+        try:
+            result = asyncio.run(run_load(host, port, args.users, args.seconds, args.think, args.rows, args.seed))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    for kind, summary in result["requests_by_kind"].items():
+        print(f"{kind:<16} p50 {summary['p50']:9.3f}  p95 {summary['p95']:9.3f}  p99 {summary['p99']:9.3f} ms  "
+              f"({summary['runs']} requests, {result['errors'].get(kind, 0)} errors)", file=sys.stderr)
+    print(f"{result['requests']} requests in {result['seconds']} s from {result['users']} users: "
+          f"{result['throughput']} requests/s", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import csv
+import json
+
+from media import index_bulk_media, split_legacy_paths
+from search_index import index_rows_after, suspend_insert_trigger
+from validation import ValidationError, validate_listing
+
+# Bulk import of listings from CSV or JSON lines files.
+#
+# Files are parsed as a stream, each record is validated the same way as in
+# add_data, and valid rows are inserted with executemany in large transactions.
+# Both the CSV layout written by export_data (ID, Address, Price, ...) and plain
+# column names (address, price, ...) are accepted; any ID column is ignored and
+# new ids are assigned. The full-text index is updated once per batch instead
+# of once per row.
+INSERT_QUERY = ("INSERT INTO apartments (address, price, description, images, video, user_role, user_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)")
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+        self.cancelled = False
+
+    def summary(self):
+        text = f"Imported {self.imported} listings, skipped {self.skipped}"
+        return text + " (cancelled)" if self.cancelled else text
+
+
+def _normalize_key(key):
+    return (key or '').strip().lower().replace(' ', '_')
+
+
+# Generators yielding one dict per record, keyed by normalized column name
+def iter_csv_records(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        for record in csv.DictReader(file):
+            yield {_normalize_key(key): value for key, value in record.items()}
+
+
+# Lines that are not a JSON object are yielded as a ValidationError, which
+# record_to_row raises, so they are reported like any invalid record
+def iter_jsonl_records(path):
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield ValidationError(f"Invalid JSON: {exc}.")
+                continue
+            if isinstance(record, dict):
+                yield {_normalize_key(key): value for key, value in record.items()}
+            else:
+                yield ValidationError("Each line must be a JSON object.")
+
+
+def iter_records(path):
+    if path.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        return iter_jsonl_records(path)
+    return iter_csv_records(path)
+
+
+# Function to read a field that SQLite stores as text: a string or a number
+# (JSON lines may hold any value, CSV only strings)
+def _scalar(value, name, default=''):
+    if isinstance(value, (list, dict)):
+        raise ValidationError(f"{name} must be text, not a JSON {'list' if isinstance(value, list) else 'object'}.")
+    return default if value is None or value == '' else str(value)
+
+
+# Function to turn a record into (insert row, image paths); raises
+# ValidationError. A JSON list of images is kept as it is, so its paths may
+# contain commas; the row's images column joins them for display and search.
+def record_to_row(record):
+    if isinstance(record, ValidationError):
+        raise record
+    address = str(record.get('address') or '').strip()
+    description = str(record.get('description') or '').strip()
+    user_id = str(record.get('user_id') or '').strip()
+    price = record.get('price')
+    price = validate_listing(address, '' if price is None else str(price).strip(), description, user_id)
+    images = record.get('images') or ''
+    if isinstance(images, list):
+        paths = [path for path in (_scalar(image, 'images') for image in images) if path]
+        images = ','.join(paths)
+    else:
+        images = _scalar(images, 'images')
+        paths = split_legacy_paths(images)
+    row = (address, price, description, images, _scalar(record.get('video'), 'video'),
+           _scalar(record.get('user_role'), 'user_role', 'Student'), user_id)
+    return row, paths
+
+
+# Function to import records into the apartments table in transactions of
+# batch_size rows. progress(processed) is called after every batch; setting
+# cancel_event stops after the current batch (batches already committed stay).
+def import_records(conn, records, batch_size=10000, progress=None, cancel_event=None):
+    result = ImportResult()
+    batch = []
+    processed = 0
+
+    def flush():
+        with conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM apartments").fetchone()[0]
+            indexed = suspend_insert_trigger(conn)
+            conn.executemany(INSERT_QUERY, [row for row, _ in batch])
+            if indexed:
+                index_rows_after(conn, last_id)
+            index_bulk_media(conn, last_id, [paths for _, paths in batch])
+        result.imported += len(batch)
+        batch.clear()
+        if progress:
+            progress(processed)
+
+    for line, record in enumerate(records, start=1):
+        processed += 1
+        try:
+            batch.append(record_to_row(record))
+        except ValidationError as exc:
+            result.skipped += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append((line, str(exc)))
+        if len(batch) >= batch_size:
+            flush()
+            if cancel_event is not None and cancel_event.is_set():
+                result.cancelled = True
+                return result
+    if batch:
+        flush()
+    return result
+
+
+def import_file(conn, path, batch_size=10000, progress=None, cancel_event=None):
+    return import_records(conn, iter_records(path), batch_size, progress, cancel_event)
@@ -0,0 +1,95 @@
+import csv
+import os
+import threading
+
+# Streaming CSV export.
+#
+# Rows are pulled from the cursor with fetchmany in fixed-size chunks and written
+# as they arrive, so memory use does not depend on the size of the table. The
+# export can be restricted to any query (e.g. the current search or price-range
+# filter), reports progress, and can be cancelled. The file is written to a
+# temporary name and only renamed into place once complete.
+HEADER = ["ID", "Address", "Price", "Description", "Images", "Video", "User Role", "User ID"]
+ALL_ROWS_QUERY = ("SELECT * FROM apartments ORDER BY id", ())
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+# Generator yielding the rows of a query in chunks of chunk_size
+def iter_chunks(conn, query, params=(), chunk_size=1000):
+    cursor = conn.execute(query, params)
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def count_rows(conn, query, params=()):
+    return conn.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+
+
+# Function to write the result of a query to a CSV file. progress(written, total)
+# is called after every chunk; setting cancel_event stops the export and removes
+# the partial file. Returns the number of rows written.
+def export_csv(conn, file_path, query=ALL_ROWS_QUERY[0], params=(), chunk_size=1000, progress=None, cancel_event=None):
+    total = count_rows(conn, query, params)
+    temp_path = file_path + ".part"
+    written = 0
+    try:
+        with open(temp_path, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(HEADER)
+            for chunk in iter_chunks(conn, query, params, chunk_size):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                writer.writerows(chunk)
+                written += len(chunk)
+                if progress:
+                    progress(written, total)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return written
+
+
+# Export running on its own thread with its own connection. The Tk side polls
+# written/total/done/error instead of being called back from the thread.
+class ExportTask:
+    def __init__(self, conn, file_path, query=ALL_ROWS_QUERY[0], params=(), chunk_size=1000):
+        self.conn = conn
+        self.file_path = file_path
+        self.query = query
+        self.params = params
+        self.chunk_size = chunk_size
+        self.written = 0
+        self.total = 0
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="csv-export", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _progress(self, written, total):
+        self.written, self.total = written, total
+
+    def _run(self):
+        try:
+            export_csv(self.conn, self.file_path, self.query, self.params, self.chunk_size, self._progress, self.cancel_event)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.conn.close()
+            self.done = True
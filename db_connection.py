@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# Connection management for housing_extended.db.
+#
+# The database runs in WAL mode, so readers see the last committed state and
+# never wait behind a commit, and a commit only appends to the log instead of
+# rewriting pages. Every connection gets the same tuned PRAGMAs; the defaults
+# can be overridden by a JSON file (db_settings.json next to the database, or the
+# file named by HOUSING_DB_SETTINGS) or by keyword arguments. Given a
+# PerformanceMonitor, every connection records the latency of its statements.
+DEFAULT_SETTINGS = {
+    "journal_mode": "WAL",
+    # NORMAL is durable against application crashes in WAL mode; only a power
+    # loss can roll back the last few commits.
+    "synchronous": "NORMAL",
+    # Negative values are KiB, i.e. 32 MB of page cache per connection
+    "cache_size": -32000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+    # Prepared statements kept per connection (sqlite3's default is 128). Every
+    # combination of ListingQuery criteria and sort is a statement shape of its
+    # own, on top of the application's fixed statements.
+    "cached_statements": 256,
+}
+
+
+def load_settings(database, path=None, **overrides):
+    settings = dict(DEFAULT_SETTINGS)
+    path = path or os.environ.get("HOUSING_DB_SETTINGS") or os.path.join(os.path.dirname(os.path.abspath(database)), "db_settings.json")
+    if os.path.exists(path):
+        with open(path) as file:
+            settings.update(json.load(file))
+    settings.update(overrides)
+    return settings
+
+
+def apply_pragmas(conn, settings, readonly=False):
+    for name in ("busy_timeout", "synchronous", "cache_size", "mmap_size", "temp_store"):
+        if settings.get(name) is not None:
+            conn.execute(f"PRAGMA {name} = {settings[name]}")
+    if not readonly and settings.get("journal_mode"):
+        conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+
+
+class ConnectionManager:
+    def __init__(self, database, settings_path=None, monitor=None, **overrides):
+        self.database = database
+        self.monitor = monitor
+        self.settings = load_settings(database, settings_path, **overrides)
+        self._writer = None
+        self._readers = threading.local()
+        self._opened = []
+
+    # Function to open a new tuned connection. Connections may be handed to a
+    # worker thread, but each one must only be used by one thread at a time.
+    def connect(self, readonly=False):
+        factory = sqlite3.Connection
+        if self.monitor is not None:
+            from instrumentation import InstrumentedConnection
+            factory = InstrumentedConnection
+        if readonly and self.database != ':memory:':
+            uri = Path(self.database).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=factory,
+                                   cached_statements=self.settings["cached_statements"])
+        else:
+            conn = sqlite3.connect(self.database, check_same_thread=False, factory=factory,
+                                   cached_statements=self.settings["cached_statements"])
+        if self.monitor is not None:
+            conn.monitor = self.monitor
+        apply_pragmas(conn, self.settings, readonly)
+        return conn
+
+    # The single shared write connection
+    def writer(self):
+        if self._writer is None:
+            self._writer = self.connect()
+        return self._writer
+
+    # A read-only connection for the calling thread
+    def reader(self):
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = self.connect(readonly=True)
+            self._opened.append(conn)
+        return conn
+
+    # Function to close the write connection and every per-thread reader
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for conn in self._opened:
+            conn.close()
+        self._opened = []
+        self._readers = threading.local()
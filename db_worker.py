@@ -0,0 +1,139 @@
+import queue
+import threading
+import time
+
+
+# Background database executor.
+#
+# Jobs are run off the Tk thread on worker threads that own their connections.
+# There is one lane for writes and, if a read connection is given, a second lane
+# for read-only jobs, so searches and page loads never wait behind a commit. A
+# job is a function taking the connection; its result (or exception) is handed
+# back to a callback on the Tk thread, which picks it up by polling the results
+# queue with window.after. Tk widgets must never be touched from inside a job.
+#
+# Jobs may belong to a named group (e.g. 'tree' for everything that fills the
+# main Treeview). Submitting a new job to a group, or calling cancel(group),
+# makes older jobs of that group stale: pending ones are skipped, a running one
+# is interrupted, and their results are dropped.
+#
+# If a PerformanceMonitor is set as monitor, every job submitted while a
+# monitored handler runs records its run time ('job') and the time from submit
+# until its done callback returned ('round trip') under the handler's name.
+class _Lane:
+    def __init__(self, worker, conn, name):
+        self.worker = worker
+        self.conn = conn
+        self.jobs = queue.Queue()
+        self.running = None
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def _run(self):
+        worker = self.worker
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                break
+            job, on_done, on_error, group, generation, tag = item
+            with worker.lock:
+                if worker._is_stale(group, generation):
+                    continue
+                self.running = (group, generation)
+            start = time.perf_counter()
+            try:
+                result, error = job(self.conn), None
+            except Exception as exc:
+                result, error = None, exc
+                if self.conn.in_transaction:
+                    self.conn.rollback()
+            if tag is not None:
+                worker.monitor.record('job', tag[0], (time.perf_counter() - start) * 1000)
+            with worker.lock:
+                self.running = None
+                if worker._is_stale(group, generation):
+                    continue
+            worker.results.put((on_done, on_error, result, error, group, generation, tag))
+
+
+class DBWorker:
+    def __init__(self, write_conn, read_conn=None, poll_interval=50):
+        self.conn = write_conn
+        self.read_conn = read_conn or write_conn
+        self.poll_interval = poll_interval
+        self.error_handler = None
+        self.monitor = None
+        self.results = queue.Queue()
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.writer = _Lane(self, write_conn, "db-writer")
+        self.reader = _Lane(self, read_conn, "db-reader") if read_conn is not None else self.writer
+        self.window = None
+
+    def _lanes(self):
+        return (self.writer,) if self.reader is self.writer else (self.writer, self.reader)
+
+    # Function to start the worker threads and the Tk-side polling loop
+    def start(self, window):
+        self.window = window
+        for lane in self._lanes():
+            lane.thread.start()
+        self.window.after(self.poll_interval, self._poll)
+
+    def _bump(self, group):
+        generation = self.generations.get(group, 0) + 1
+        self.generations[group] = generation
+        for lane in self._lanes():
+            if lane.running is not None and lane.running[0] == group:
+                lane.conn.interrupt()
+        return generation
+
+    # Function to queue a job; on_done(result) runs on the Tk thread. Read-only
+    # jobs go to the reader lane and must not write.
+    def submit(self, job, on_done=None, group=None, on_error=None, readonly=False):
+        with self.lock:
+            generation = self._bump(group) if group is not None else 0
+        tag = None
+        if self.monitor is not None and self.monitor.current_handler is not None:
+            tag = (self.monitor.current_handler, time.perf_counter())
+        lane = self.reader if readonly else self.writer
+        lane.jobs.put((job, on_done, on_error, group, generation, tag))
+
+    # Function to cancel every pending or running job of a group
+    def cancel(self, group):
+        with self.lock:
+            self._bump(group)
+
+    def _is_stale(self, group, generation):
+        return group is not None and self.generations.get(group) != generation
+
+    # The next poll is scheduled even if a callback raises; the exception is
+    # left to Tk's error reporting and the remaining results wait for the next poll
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    on_done, on_error, result, error, group, generation, tag = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if self._is_stale(group, generation):
+                    continue
+                try:
+                    if error is not None:
+                        handler = on_error or self.error_handler
+                        if handler:
+                            handler(error)
+                    elif on_done:
+                        on_done(result)
+                finally:
+                    if tag is not None:
+                        self.monitor.record('round trip', tag[0], (time.perf_counter() - tag[1]) * 1000)
+        finally:
+            self.window.after(self.poll_interval, self._poll)
+
+    # Function to finish the queued jobs and stop the worker threads; the
+    # connections belong to the caller and are left open
+    def stop(self):
+        for lane in self._lanes():
+            lane.jobs.put(None)
+        for lane in self._lanes():
+            lane.thread.join()
@@ -0,0 +1,1166 @@
+import startup_timing
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from PIL import Image, ImageTk
+import os
+import sys
+import threading
+from itertools import islice
+from pagination import KeysetPaginator
+from virtual_tree import VirtualTreeview
+from db_worker import DBWorker
+from db_connection import ConnectionManager
+from housing_store import HousingStore, ListingInput
+from api_client import RemotePaginator, RemoteStore
+from listing_query import ListingQuery
+from search_index import SEARCH_COLUMNS
+from search_cache import SearchCache
+from csv_export import ExportTask, ALL_ROWS_QUERY
+from validation import ValidationError, parse_price_range
+from thumbnails import ThumbnailCache, load_background
+from media import ingest_result, pending_renditions, record_renditions
+from media_store import MediaStore, open_with_default_app
+from listing_repository import ListingRepository
+from analytics import AnalyticsCache, data_version
+from price_snapshot import PriceSnapshot, SnapshotPaginator
+from instrumentation import PerformanceMonitor
+startup_timing.mark("imports")
+
+# Create the main window
+window = tk.Tk()
+window.title("Student Housing Management Application")
+window.geometry("1200x800")
+startup_timing.mark("main window")
+
+# Background Image, downscaled to the window size (the scaled copy is cached)
+background_image_path = "background.jpg"  # Ensure this image is in the same directory
+background_image = load_background(background_image_path, (1200, 800))
+background_photo = ImageTk.PhotoImage(background_image)
+
+background_label = tk.Label(window, image=background_photo)
+background_label.place(relwidth=1, relheight=1)
+
+# Cache of decoded image thumbnails (memory LRU backed by an on-disk store)
+thumbnail_cache = ThumbnailCache(window)
+
+# Uploads are copied into a content-addressed store and rendered (web size,
+# thumbnail, video poster) in a process pool as soon as they are chosen;
+# ingesting maps each chosen file to the Future of its IngestedMedia
+media_store = MediaStore()
+ingesting = {}
+
+# Background frame to hold all widgets on top of the background image
+main_frame = tk.Frame(window, bg='#ffffff')
+main_frame.place(relwidth=1, relheight=1)
+startup_timing.mark("background image")
+
+# Latency histograms of every SQL statement and handler, shown in the
+# Performance tab and optionally dumped to a JSON file
+monitor = PerformanceMonitor()
+if os.environ.get("HOUSING_PERF_DUMP"):
+    monitor.start_dump(os.environ["HOUSING_PERF_DUMP"], float(os.environ.get("HOUSING_PERF_DUMP_INTERVAL", 60)))
+
+# Connect to SQLite database (WAL mode, separate read and write connections),
+# or with HOUSING_API_URL set, to a shared server (housing_cli.py serve) that
+# owns the database. The remote store has the same methods, so the handlers
+# below are the same in both modes; what needs the database file itself
+# (import, export, the User Data tab, rendering old media) is local only.
+api_url = os.environ.get("HOUSING_API_URL")
+if api_url:
+    store = RemoteStore(api_url)
+    db_manager = conn = None
+    db_worker = DBWorker(store, store)
+else:
+    database_path = 'housing_extended.db'
+    db_manager = ConnectionManager(database_path, monitor=monitor)
+
+    # Data operations (creates or upgrades the schema). The handlers below only
+    # read the widgets and run store calls as DB worker jobs, passing the job's
+    # connection; the store's action log is flushed in batches on its own thread.
+    store = HousingStore(manager=db_manager)
+
+    # Read-only connection for the Tk thread
+    conn = db_manager.reader()
+
+    # Background worker that runs the handlers' queries off the Tk thread
+    db_worker = DBWorker(db_manager.writer(), db_manager.connect(readonly=True))
+db_worker.error_handler = lambda error: messagebox.showerror("Database Error", str(error))
+db_worker.monitor = monitor
+startup_timing.mark("database and migrations")
+
+# Global variables for pagination
+page_size = 10
+current_page = 0
+current_rows = []
+current_total_pages = 1
+uploaded_images = []
+paginator = RemotePaginator(store, page_size) if api_url else KeysetPaginator(db_worker.read_conn, 'apartments', page_size)
+tree_filter = None
+
+# Optional columnar snapshot of every listing's price and role
+# (HOUSING_PRICE_SNAPSHOT=1, local database only): price-range filters and the
+# analytics are answered from it, and only the rows of the page shown are read
+price_snapshot = PriceSnapshot() if os.environ.get("HOUSING_PRICE_SNAPSHOT") and not api_url else None
+if price_snapshot is not None:
+    paginator = SnapshotPaginator(paginator, price_snapshot)
+
+# Function to (re)build the price snapshot and report its size. It is loaded
+# on a thread with its own connection, as reading a large table in price order
+# takes seconds; until it is ready, price filters run in SQL.
+def load_price_snapshot():
+    def run():
+        snapshot_conn = db_manager.connect(readonly=True)
+        try:
+            count = price_snapshot.load(snapshot_conn)
+        finally:
+            snapshot_conn.close()
+        usage = price_snapshot.memory_usage()["total"]
+        print(f"price snapshot: {count} listings in {usage / 1e6:.1f} MB", file=sys.stderr)
+
+    threading.Thread(target=run, name="price-snapshot", daemon=True).start()
+
+def on_price_snapshot_changed(event, payload):
+    price_snapshot.apply(event, payload)
+    if event == 'reset':
+        load_price_snapshot()
+
+# Criteria and sort of what the main Treeview shows. The search box, the
+# Filters tab and the column headings each change part of it; it is shown
+# page by page with the paginator, or streamed in relevance order for a text
+# search without a sort column.
+current_query = ListingQuery()
+
+# Mutations are published to the views as change events
+listings = ListingRepository()
+
+# Search-as-you-type: keystrokes are debounced, results come from a cache of
+# recent searches when possible, and the Treeview gets the first rows at once
+# while the rest is streamed in chunks. Against a server other clients change
+# the listings too, so nothing is cached there.
+search_cache = SearchCache(use_fts=store.fts_enabled, max_entries=0 if api_url else 32)
+SEARCH_DEBOUNCE_MS = 250
+SEARCH_FIRST_ROWS = 50
+SEARCH_CHUNK_ROWS = 500
+search_after = None
+last_search_term = ''
+search_stream = 0
+
+# Function to replace the rows of a Treeview
+def fill_tree(target_tree, rows):
+    for row in target_tree.get_children():
+        target_tree.delete(row)
+    for row in rows:
+        target_tree.insert('', tk.END, iid=str(row[0]), values=row)
+
+# Function to show the listings matching a query in the main Treeview. The
+# query is remembered, so paging, sorting and export_data all apply to exactly
+# what is shown.
+def show_query(query):
+    global current_query
+    current_query = query
+    update_headings()
+    if query.text and query.sort is None:
+        run_search(query)
+    else:
+        load_data()
+
+# Function to add data to the database
+@monitor.handler
+def add_data():
+    address = address_entry.get()
+    price = price_entry.get()
+    description = description_entry.get()
+    user_role = user_role_var.get()
+    user_id = user_id_entry.get()
+    video_path = video_entry.get()
+
+    try:
+        listing = ListingInput.parse(address, price, description, uploaded_images, video_path, user_role, user_id)
+    except ValidationError as exc:
+        messagebox.showerror("Input Error", str(exc))
+        return
+
+    def done(row):
+        messagebox.showinfo("Success", "Apartment added successfully.")
+        clear_entries()
+        paginator.note_insert(row[0], row[columns.index(paginator.sort_key)])
+        listings.apply_insert(row)
+
+    ingest_listing(listing, lambda stored: db_worker.submit(lambda db: store.add_listing(stored, conn=db), done))
+
+# Function to clear the input entries
+def clear_entries():
+    address_entry.delete(0, tk.END)
+    price_entry.delete(0, tk.END)
+    description_entry.delete(0, tk.END)
+    user_role_var.set('Student')
+    user_id_entry.delete(0, tk.END)
+    uploaded_images.clear()
+    ingesting.clear()
+    update_image_preview()
+    video_entry.delete(0, tk.END)
+    toggle_user_id_entry()
+
+# Function to load a page of the current query; the paginator is switched to
+# its filter and sort on the DB worker, where the paginator is used
+@monitor.handler
+def load_data(page=0):
+    query = current_query
+
+    def fetch(db):
+        paginator.set_query(query, store.fts_enabled)
+        return paginator.fetch_page(page) + (paginator.total_pages(),)
+
+    def done(result):
+        global current_page, current_rows, current_total_pages, tree_filter
+        current_page, current_rows, current_total_pages = result
+        stop_search_stream()
+        tree_filter = None if query.is_empty(store.fts_enabled) and query.sort is None else store.compile(query)
+        for page_tree in page_trees():
+            fill_tree(page_tree, current_rows)
+        update_pagination(current_total_pages)
+        on_first_page()
+
+    db_worker.submit(fetch, done, group='tree', readonly=True)
+
+# Function to load all user data; only the visible rows are materialized
+@monitor.handler
+def load_user_data():
+    if user_data_view is None:
+        return
+    db_worker.submit(lambda db: list(store.listing_ids(conn=db)), user_data_view.set_ids, readonly=True)
+
+# Function to update data in the database
+@monitor.handler
+def update_data():
+    selected_item = tree.selection()
+    if not selected_item:
+        messagebox.showerror("Selection Error", "No item selected.")
+        return
+
+    address = address_entry.get()
+    price = price_entry.get()
+    description = description_entry.get()
+    user_role = user_role_var.get()
+    user_id = user_id_entry.get()
+    video_path = video_entry.get()
+
+    try:
+        listing = ListingInput.parse(address, price, description, uploaded_images, video_path, user_role, user_id)
+    except ValidationError as exc:
+        messagebox.showerror("Input Error", str(exc))
+        return
+
+    item_id = tree.item(selected_item)['values'][0]
+
+    def update(db, listing):
+        return store.get_listing(item_id, conn=db), store.update_listing(item_id, listing, conn=db)
+
+    def done(result):
+        if apply_listing_update(*result):
+            messagebox.showinfo("Success", "Apartment updated successfully.")
+            clear_entries()
+
+    ingest_listing(listing, lambda stored: db_worker.submit(lambda db: update(db, stored), done))
+
+# Function to apply an updated row (old is the row before the change): the
+# paginator is told how the row's sort value moved and the price snapshot
+# where the row was, then the views are patched. row is None if the listing
+# was deleted meanwhile; returns whether it was applied.
+def apply_listing_update(old, row):
+    if row is None:
+        messagebox.showerror("Update Error", "The apartment no longer exists.")
+        return False
+    index = columns.index(paginator.sort_key)
+    paginator.note_update(row[0], old[index] if old else None, row[index])
+    if price_snapshot is not None:
+        price_snapshot.update(row[0], old[2] if old else None, row[2], row[6])
+    listings.apply_update(row)
+    return True
+
+# Function to start ingesting a chosen file, once per file
+def ingest_file(path, kind='image'):
+    future = ingesting.get(path)
+    if future is None:
+        future = ingesting[path] = media_store.submit(path, kind)
+    return future
+
+# Function to call callback(futures) on the Tk thread once every future is done
+def when_ingested(futures, callback):
+    if all(future.done() for future in futures):
+        callback(futures)
+    else:
+        window.after(50, when_ingested, futures, callback)
+
+# Function to wait (without blocking the UI) until a listing's files are in
+# the media store, then call save(listing) with the stored copies
+def ingest_listing(listing, save):
+    files = [('image', path) for path in listing.images] + ([('video', listing.video)] if listing.video else [])
+    futures = [ingest_file(path, kind) for kind, path in files]
+
+    def ready(futures):
+        errors = [str(future.exception()) for future in futures if future.exception() is not None]
+        if errors:
+            messagebox.showerror("Media Error", "\n".join(errors))
+            return
+        save(listing.with_media({future.result().source: future.result() for future in futures}))
+
+    when_ingested(futures, ready)
+
+# Function to delete data from the database
+@monitor.handler
+def delete_data():
+    selected_item = tree.selection()
+    if not selected_item:
+        messagebox.showerror("Selection Error", "No item selected.")
+        return
+
+    item_id = tree.item(selected_item)['values'][0]
+
+    def delete(db):
+        return store.get_listing(item_id, conn=db), store.delete_listing(item_id, conn=db)
+
+    # old is the row before the delete; nothing was deleted if it was already gone
+    def done(result):
+        old, deleted = result
+        if not deleted:
+            messagebox.showerror("Delete Error", "The apartment no longer exists.")
+            return
+        messagebox.showinfo("Success", "Apartment deleted successfully.")
+        clear_entries()
+        paginator.note_delete(item_id, old[columns.index(paginator.sort_key)] if old else None)
+        if price_snapshot is not None and old:
+            price_snapshot.remove(old[0], old[2])
+        listings.apply_delete(item_id)
+
+    db_worker.submit(delete, done)
+
+# Function to search data in the database, within the active filters
+@monitor.handler
+def search_data():
+    global last_search_term
+    last_search_term = search_entry.get()
+    show_query(current_query.replace(text=last_search_term, text_columns=SEARCH_COLUMNS))
+
+# Function to clear the search text; the other filters stay active
+@monitor.handler
+def clear_search():
+    global last_search_term
+    search_entry.delete(0, tk.END)
+    last_search_term = ''
+    show_query(current_query.replace(text='', text_columns=SEARCH_COLUMNS))
+
+# Function to debounce keystrokes in the search entry: the search runs once
+# typing has paused, and only if the term changed
+def on_search_typed(event):
+    global search_after
+    if search_entry.get() == last_search_term:
+        return
+    db_worker.cancel('tree')
+    if search_after is not None:
+        window.after_cancel(search_after)
+    search_after = window.after(SEARCH_DEBOUNCE_MS, search_as_you_type)
+
+def search_as_you_type():
+    global search_after
+    search_after = None
+    term = search_entry.get()
+    if term == last_search_term:
+        return
+    if term.strip():
+        search_data()
+    else:
+        clear_search()
+
+# Function to show the result of a search. A cached result, or one refined in
+# memory from a cached broader search, is shown without a query; otherwise the
+# query's rows are read in chunks on the DB worker, each chunk appended to the
+# Treeview as it arrives, and the complete result is cached.
+def run_search(listing_query):
+    global tree_filter
+    query, params = store.compile(listing_query)
+    columns = listing_query.text_columns
+    key = search_cache.key(listing_query)
+    stream = stop_search_stream()
+    db_worker.cancel('tree')
+
+    rows = search_cache.lookup(key)
+    if rows is not None:
+        tree_filter = (query, params)
+        fill_tree(tree, [])
+        append_search_rows(stream, rows, 0)
+        return
+
+    generation = search_cache.generation
+    collected, texts = [], []
+    cacheable = True
+
+    # Runs on the DB worker; the texts for refining later searches are
+    # prepared here rather than on the Tk thread
+    def fetch(db, rows, size):
+        first = rows is None
+        if first:
+            rows = store.query(listing_query, conn=db)
+        chunk = list(islice(rows, size))
+        return rows, first, chunk, size, search_cache.texts(chunk, columns) if cacheable else None
+
+    def show(result):
+        global tree_filter
+        nonlocal cacheable
+        rows, first, chunk, size, chunk_texts = result
+        if first:
+            tree_filter = (query, params)
+            fill_tree(tree, [])
+        for row in chunk:
+            tree.insert('', tk.END, iid=str(row[0]), values=row)
+        if cacheable:
+            collected.extend(chunk)
+            texts.extend(chunk_texts)
+            cacheable = len(collected) <= search_cache.max_result_rows
+        if len(chunk) == size:
+            db_worker.submit(lambda db: fetch(db, rows, SEARCH_CHUNK_ROWS), show, group='tree', readonly=True)
+        elif cacheable:
+            search_cache.put(key, collected, generation, texts)
+
+    db_worker.submit(lambda db: fetch(db, None, SEARCH_FIRST_ROWS), show, group='tree', readonly=True)
+
+# Function to append cached search results to the Treeview a chunk at a time,
+# until another search or view replaces them
+def append_search_rows(stream, rows, start):
+    if stream != search_stream:
+        return
+    chunk = rows[start:start + (SEARCH_CHUNK_ROWS if start else SEARCH_FIRST_ROWS)]
+    for row in chunk:
+        tree.insert('', tk.END, iid=str(row[0]), values=row)
+    if start + len(chunk) < len(rows):
+        window.after(1, append_search_rows, stream, rows, start + len(chunk))
+
+# Function to stop filling the Treeview from a previous search; returns the
+# number identifying the next one
+def stop_search_stream():
+    global search_stream
+    search_stream += 1
+    return search_stream
+
+# Function to view apartment details
+@monitor.handler
+def view_details():
+    selected_item = tree.selection()
+    if not selected_item:
+        messagebox.showerror("Selection Error", "No item selected.")
+        return
+
+    item_id = tree.item(selected_item)['values'][0]
+    db_worker.submit(lambda db: (store.get_listing(item_id, conn=db), store.get_media_details(item_id, conn=db)),
+                     show_details, readonly=True)
+
+# Function to open the details window for a fetched apartment row and its
+# media; previews use the stored thumbnails, so no original is decoded
+def show_details(result):
+    apartment, media = result
+    if apartment:
+        details_window = tk.Toplevel(window)
+        details_window.title("Apartment Details")
+        details_window.geometry("400x400")
+
+        address, price, description, images, video, user_role, user_id = apartment[1:]
+
+        tk.Label(details_window, text=f"Address: {address}").pack(pady=5)
+        tk.Label(details_window, text=f"Price: {price}").pack(pady=5)
+        tk.Label(details_window, text=f"Description: {description}").pack(pady=5)
+        tk.Label(details_window, text=f"User Role: {user_role}").pack(pady=5)
+        tk.Label(details_window, text=f"User ID: {user_id}").pack(pady=5)
+
+        for kind, path, thumb_path, web_path, width, height, duration in media:
+            if kind == 'video':
+                video = path
+                info = f" ({width}x{height}, {duration:.0f} s)" if duration else ""
+                tk.Label(details_window, text=f"Video{info}: {os.path.basename(path)}").pack(pady=5)
+                if not thumb_path:
+                    continue
+            panel = tk.Label(details_window, text="Loading...")
+            panel.pack(pady=5)
+            thumbnail_cache.request(thumb_path or path, lambda photo, panel=panel: show_thumbnail(panel, photo))
+
+        if video:
+            ttk.Button(details_window, text="Play Video", command=lambda: open_with_default_app(video)).pack(pady=5)
+
+# Function to export data to a CSV file. If a search or filter is active only
+# its result is exported; rows are streamed on a background thread.
+@monitor.handler
+def export_data():
+    if db_manager is None:
+        messagebox.showinfo("Export", "Export runs on the server's machine: housing_cli.py export.")
+        return
+    file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+    if not file_path:
+        return
+
+    query, params = tree_filter or ALL_ROWS_QUERY
+    task = ExportTask(db_manager.connect(readonly=True), file_path, query, params)
+
+    progress_window = tk.Toplevel(window)
+    progress_window.title("Exporting")
+    progress_label = ttk.Label(progress_window, text="Exporting...")
+    progress_label.pack(padx=10, pady=5)
+    progress_bar = ttk.Progressbar(progress_window, length=300, maximum=100)
+    progress_bar.pack(padx=10, pady=5)
+    ttk.Button(progress_window, text="Cancel", command=task.cancel).pack(pady=5)
+
+    task.start()
+    poll_export(task, progress_window, progress_label, progress_bar)
+
+# Function to bulk import listings from a CSV or JSON lines file
+@monitor.handler
+def import_data():
+    if db_manager is None:
+        messagebox.showinfo("Import", "Import runs on the server's machine: housing_cli.py import.")
+        return
+    file_path = filedialog.askopenfilename(title="Import Listings", filetypes=[("CSV files", "*.csv"), ("JSON lines", "*.jsonl;*.json")])
+    if not file_path:
+        return
+
+    def done(result):
+        paginator.reset()
+        listings.apply_reset()
+        message = result.summary() + "."
+        if result.errors:
+            message += "\n\n" + "\n".join(f"Record {line}: {error}" for line, error in result.errors[:10])
+        messagebox.showinfo("Import Finished", message)
+
+    db_worker.submit(lambda db: store.import_file(file_path, conn=db), done)
+
+# Function to update the export progress window until the export finishes
+def poll_export(task, progress_window, progress_label, progress_bar):
+    if task.total:
+        progress_bar['value'] = 100 * task.written / task.total
+        progress_label.config(text=f"Exported {task.written} of {task.total} rows")
+    if not task.done:
+        window.after(100, poll_export, task, progress_window, progress_label, progress_bar)
+        return
+
+    progress_window.destroy()
+    if task.error is not None:
+        messagebox.showerror("Export Error", str(task.error))
+    elif task.cancelled:
+        messagebox.showinfo("Export Cancelled", "The export was cancelled.")
+    else:
+        messagebox.showinfo("Success", f"Data exported successfully ({task.written} rows).")
+
+# Function to patch the views after a listing changed. Each event touches only
+# the affected Treeview items; nothing is reloaded except after a reset.
+def on_listing_changed(event, payload):
+    if event == 'reset':
+        load_data()
+        load_user_data()
+        return
+
+    if event == 'delete':
+        for page_tree in page_trees():
+            if page_tree.exists(str(payload)):
+                page_tree.delete(str(payload))
+        if user_data_view is not None:
+            user_data_view.delete_row(payload)
+    elif event == 'update':
+        row = payload.as_row()
+        for page_tree in page_trees():
+            if page_tree.exists(str(payload.id)):
+                page_tree.item(str(payload.id), values=row)
+        if user_data_view is not None:
+            user_data_view.refresh_row(payload.id, row)
+    elif event == 'insert':
+        row = payload.as_row()
+        total = paginator.total
+        on_last_page = total is not None and current_page >= (total + page_size - 1) // page_size - 1
+        if tree_filter is None and on_last_page and len(tree.get_children()) < page_size:
+            for page_tree in page_trees():
+                page_tree.insert('', tk.END, iid=str(payload.id), values=row)
+        if user_data_view is not None:
+            user_data_view.insert_row(payload.id)
+
+    # A total the paginator no longer knows is counted again on the reader lane
+    db_worker.submit(lambda db: paginator.total_pages(), update_total_pages, group='pages', readonly=True)
+    if notebook.select() == str(analytics_frame) and analytics_cache is not None:
+        show_analytics()
+
+# Treeviews showing the current page (the management tab may not be built yet)
+def page_trees():
+    return [page_tree for page_tree in (tree, management_tree) if page_tree is not None]
+
+# Function to show the price statistics and charts; they are only recomputed
+# when the listings changed since the last time. Other clients, instances and
+# the command line change them too, so the version is asked for first: the
+# server's, or the database's data_version on the reader lane's connection.
+@monitor.handler
+def show_analytics():
+    analytics_status.config(text="Updating...")
+    if api_url:
+        db_worker.submit(lambda db: store.current_version(), refresh_analytics, readonly=True)
+    else:
+        db_worker.submit(data_version, refresh_analytics, readonly=True)
+
+def refresh_analytics(version):
+    analytics_cache.refresh(version, display_analytics,
+                            lambda error: analytics_status.config(text=f"Analytics failed: {error}"))
+
+def display_analytics(result):
+    stats, (width, height, rgba) = result
+    fill_tree(analytics_tree, [(role or "(none)", count, f"{average:.2f}", low, high)
+                               for role, count, average, low, high in stats["roles"]])
+    chart = ImageTk.PhotoImage(Image.frombuffer("RGBA", (width, height), rgba, "raw", "RGBA", 0, 1))
+    analytics_chart.config(image=chart)
+    analytics_chart.image = chart  # Keep a reference to avoid garbage collection
+    analytics_status.config(text=f"{sum(row[1] for row in stats['roles'])} listings")
+
+def update_total_pages(total_pages):
+    global current_total_pages
+    current_total_pages = total_pages
+    update_pagination(total_pages)
+
+# Function to update pagination buttons
+def update_pagination(total_pages):
+    for button in (prev_button, management_prev_button):
+        if button is not None:
+            button.config(state=tk.NORMAL if current_page > 0 else tk.DISABLED)
+    for button in (next_button, management_next_button):
+        if button is not None:
+            button.config(state=tk.NORMAL if current_page < total_pages - 1 else tk.DISABLED)
+
+# Function to upload images
+def upload_images():
+    filenames = filedialog.askopenfilenames(title="Select Images", filetypes=[("Image files", "*.jpg;*.jpeg;*.png")])
+    if len(uploaded_images) + len(filenames) > 6:
+        messagebox.showerror("Image Error", "You can upload a maximum of 6 images.")
+        return
+    uploaded_images.extend(filenames)
+    for filename in filenames:
+        ingest_file(filename)
+    update_image_preview()
+
+# Function to upload a video
+def upload_video():
+    filename = filedialog.askopenfilename(title="Select Video", filetypes=[("Video files", "*.mp4;*.mov;*.avi")])
+    if filename:
+        video_entry.delete(0, tk.END)
+        video_entry.insert(0, filename)
+        ingest_file(filename, 'video')
+
+# Function to update the image preview; each thumbnail appears once its
+# upload has been ingested, from the thumbnail rendition
+def update_image_preview():
+    for widget in image_frame.winfo_children():
+        widget.destroy()
+    for idx, image_path in enumerate(uploaded_images):
+        panel = tk.Label(image_frame, text="Loading...")
+        panel.grid(row=0, column=idx, padx=5, pady=5)
+        when_ingested([ingest_file(image_path)], lambda futures, panel=panel: preview_ingested(panel, futures[0]))
+
+def preview_ingested(panel, future):
+    media = ingest_result(future)
+    if media is None:
+        if panel.winfo_exists():
+            panel.config(text="Invalid image")
+        return
+    thumbnail_cache.request(media.thumb_path, lambda photo: show_thumbnail(panel, photo))
+
+# Function to put a loaded thumbnail into its placeholder label
+def show_thumbnail(panel, photo):
+    if not panel.winfo_exists():
+        return
+    if photo is None:
+        panel.config(text="Image not found")
+        return
+    panel.config(image=photo, text="")
+    panel.image = photo  # Keep a reference to avoid garbage collection
+
+# Function to show the listings matching every criterion of the Filters tab
+# together with the search text, keeping the current sort
+@monitor.handler
+def apply_filters():
+    try:
+        query = ListingQuery.parse(search_entry.get(), filter_entry.get(), min_price_entry.get(), max_price_entry.get(),
+                                   filter_user_id_entry.get(), has_images_var.get(), has_video_var.get(),
+                                   sort=current_query.sort, descending=current_query.descending)
+    except ValidationError as exc:
+        messagebox.showerror("Input Error", str(exc))
+        return
+
+    show_query(query)
+
+# Function to clear the Filters tab and the search text
+@monitor.handler
+def clear_filters():
+    global last_search_term
+    for entry in (search_entry, filter_entry, min_price_entry, max_price_entry, filter_user_id_entry):
+        entry.delete(0, tk.END)
+    has_images_var.set("Any")
+    has_video_var.set("Any")
+    last_search_term = ''
+    show_query(ListingQuery(sort=current_query.sort, descending=current_query.descending))
+
+# Function to sort by a column when its heading is clicked; clicking the
+# sorted column again reverses the order. Only the page shown is read, from the
+# column's index.
+@monitor.handler
+def sort_by(column):
+    descending = column == current_query.sort and not current_query.descending
+    show_query(current_query.replace(sort=column, descending=descending))
+
+# Function to mark the sorted column in the headings of the page Treeviews
+def update_headings():
+    for page_tree in page_trees():
+        for col in columns:
+            arrow = (" \u25bc" if current_query.descending else " \u25b2") if col == current_query.sort else ""
+            page_tree.heading(col, text=col.capitalize() + arrow)
+
+# Additional functionalities
+@monitor.handler
+def reset_database():
+    response = messagebox.askyesno("Reset Database", "Are you sure you want to reset the database? This action cannot be undone.")
+    if response:
+        def done(result):
+            paginator.reset(total=0)
+            listings.apply_reset()
+            messagebox.showinfo("Success", "Database has been reset.")
+
+        db_worker.submit(lambda db: store.reset(conn=db), done)
+
+@monitor.handler
+def change_address():
+    selected_item = tree.selection()
+    if not selected_item:
+        messagebox.showerror("Selection Error", "No item selected.")
+        return
+
+    new_address = address_entry.get()
+    if not new_address:
+        messagebox.showerror("Input Error", "New address is required.")
+        return
+
+    item_id = tree.item(selected_item)['values'][0]
+
+    def done(result):
+        if apply_listing_update(*result):
+            messagebox.showinfo("Success", "Address updated successfully.")
+
+    db_worker.submit(lambda db: (store.get_listing(item_id, conn=db), store.change_address(item_id, new_address, conn=db)),
+                     done)
+
+# Function to search addresses and descriptions within a 'min-max' price range
+@monitor.handler
+def advanced_search():
+    global last_search_term
+    price_range = advanced_price_range_entry.get()
+    try:
+        min_price, max_price = parse_price_range(price_range) if price_range.strip() else (None, None)
+    except ValidationError as exc:
+        messagebox.showerror("Input Error", str(exc))
+        return
+
+    last_search_term = search_entry.get()
+    show_query(current_query.replace(text=last_search_term, text_columns=("address", "description"),
+                                     min_price=min_price, max_price=max_price))
+
+# Function to toggle the visibility of the user ID entry field based on user role
+def toggle_user_id_entry(*args):
+    user_role = user_role_var.get()
+    if user_role == "Student":
+        user_id_label.config(text="Student ID:")
+        user_id_entry.grid(column=1, row=4, padx=10, pady=10)
+    elif user_role == "Management":
+        user_id_label.config(text="National ID:")
+        user_id_entry.grid(column=1, row=4, padx=10, pady=10)
+    else:
+        user_id_label.grid_remove()
+        user_id_entry.grid_remove()
+
+# Function to show recent actions
+@monitor.handler
+def show_recent_actions():
+    db_worker.submit(lambda db: list(store.recent_actions(100, conn=db)), show_actions_window, readonly=True)
+
+def show_actions_window(rows):
+    recent_actions_window = tk.Toplevel(window)
+    recent_actions_window.title("Recent Actions")
+    recent_actions_window.geometry("400x400")
+    actions_tree = ttk.Treeview(recent_actions_window, columns=("ID", "Action", "Timestamp"), show="headings")
+    actions_tree.heading("ID", text="ID")
+    actions_tree.heading("Action", text="Action")
+    actions_tree.heading("Timestamp", text="Timestamp")
+    actions_tree.pack(expand=True, fill='both')
+    fill_tree(actions_tree, rows)
+
+# Create notebook for tabs
+notebook = ttk.Notebook(main_frame)
+notebook.pack(expand=1, fill='both')
+
+# Create first tab for data entry
+entry_frame = ttk.Frame(notebook)
+notebook.add(entry_frame, text="Data Entry")
+
+# Create second tab for data display
+display_frame = ttk.Frame(notebook)
+notebook.add(display_frame, text="Data Display")
+
+# Create third tab for data management
+management_frame = ttk.Frame(notebook)
+notebook.add(management_frame, text="Data Management")
+
+# Create fourth tab for filters
+filter_frame = ttk.Frame(notebook)
+notebook.add(filter_frame, text="Filters")
+
+# Create fifth tab for advanced features
+advanced_frame = ttk.Frame(notebook)
+notebook.add(advanced_frame, text="Advanced Features")
+
+# Create sixth tab for user data
+user_data_frame = ttk.Frame(notebook)
+notebook.add(user_data_frame, text="User Data")
+
+# Create seventh tab for recent actions
+actions_frame = ttk.Frame(notebook)
+notebook.add(actions_frame, text="Recent Actions")
+
+# Create eighth tab for price analytics
+analytics_frame = ttk.Frame(notebook)
+notebook.add(analytics_frame, text="Analytics")
+
+# Create ninth tab for performance statistics
+performance_frame = ttk.Frame(notebook)
+notebook.add(performance_frame, text="Performance")
+
+# Widgets for data entry tab
+ttk.Label(entry_frame, text="Address:").grid(column=0, row=0, padx=10, pady=10)
+address_entry = ttk.Entry(entry_frame)
+address_entry.grid(column=1, row=0, padx=10, pady=10)
+
+ttk.Label(entry_frame, text="Price:").grid(column=0, row=1, padx=10, pady=10)
+price_entry = ttk.Entry(entry_frame)
+price_entry.grid(column=1, row=1, padx=10, pady=10)
+
+ttk.Label(entry_frame, text="Description:").grid(column=0, row=2, padx=10, pady=10)
+description_entry = ttk.Entry(entry_frame)
+description_entry.grid(column=1, row=2, padx=10, pady=10)
+
+# User Role dropdown
+ttk.Label(entry_frame, text="User Role:").grid(column=0, row=3, padx=10, pady=10)
+user_role_var = tk.StringVar(value="Student")
+user_role_var.trace('w', toggle_user_id_entry)
+user_role_menu = ttk.Combobox(entry_frame, textvariable=user_role_var, values=["Student", "Management"])
+user_role_menu.grid(column=1, row=3, padx=10, pady=10)
+
+# User ID entry
+user_id_label = ttk.Label(entry_frame)
+user_id_label.grid(column=0, row=4, padx=10, pady=10)
+user_id_entry = ttk.Entry(entry_frame)
+
+# Image upload
+ttk.Button(entry_frame, text="Upload Images", command=upload_images).grid(column=0, row=5, padx=10, pady=10)
+
+image_frame = ttk.Frame(entry_frame)
+image_frame.grid(column=1, row=5, padx=10, pady=10)
+
+# Video upload
+ttk.Label(entry_frame, text="Video:").grid(column=0, row=6, padx=10, pady=10)
+video_entry = ttk.Entry(entry_frame)
+video_entry.grid(column=1, row=6, padx=10, pady=10)
+ttk.Button(entry_frame, text="Upload Video", command=upload_video).grid(column=2, row=6, padx=10, pady=10)
+
+add_button = ttk.Button(entry_frame, text="Add Apartment", command=add_data)
+add_button.grid(column=0, row=7, padx=10, pady=10)
+
+update_button = ttk.Button(entry_frame, text="Update Apartment", command=update_data)
+update_button.grid(column=1, row=7, padx=10, pady=10)
+
+delete_button = ttk.Button(entry_frame, text="Delete Apartment", command=delete_data)
+delete_button.grid(column=2, row=7, padx=10, pady=10)
+
+# Widgets for data display tab
+ttk.Label(display_frame, text="Search:").grid(column=0, row=0, padx=10, pady=10)
+search_entry = ttk.Entry(display_frame)
+search_entry.grid(column=1, row=0, padx=10, pady=10)
+search_entry.bind('<KeyRelease>', on_search_typed)
+search_button = ttk.Button(display_frame, text="Search", command=search_data)
+search_button.grid(column=2, row=0, padx=10, pady=10)
+clear_search_button = ttk.Button(display_frame, text="Clear Search", command=clear_search)
+clear_search_button.grid(column=3, row=0, padx=10, pady=10)
+
+view_details_button = ttk.Button(display_frame, text="View Details", command=view_details)
+view_details_button.grid(column=1, row=1, padx=10, pady=10)
+export_button = ttk.Button(display_frame, text="Export to CSV", command=export_data)
+export_button.grid(column=0, row=1, padx=10, pady=10)
+import_button = ttk.Button(display_frame, text="Import CSV/JSON", command=import_data)
+import_button.grid(column=2, row=1, padx=10, pady=10)
+
+# Create a Treeview to display data
+columns = ("id", "address", "price", "description", "images", "video", "user_role", "user_id")
+tree = ttk.Treeview(display_frame, columns=columns, show='headings')
+for col in columns:
+    tree.heading(col, text=col.capitalize(), command=lambda col=col: sort_by(col))
+tree.grid(column=0, row=2, columnspan=4, padx=10, pady=10)
+
+# Pagination buttons
+prev_button = ttk.Button(display_frame, text="Previous", command=lambda: load_data(current_page - 1))
+prev_button.grid(column=0, row=3, padx=10, pady=10)
+next_button = ttk.Button(display_frame, text="Next", command=lambda: load_data(current_page + 1))
+next_button.grid(column=2, row=3, padx=10, pady=10)
+
+# Tabs other than Data Entry and Data Display are built the first time they are
+# selected, so startup only pays for the widgets that are on screen
+management_search_entry = management_tree = management_prev_button = management_next_button = None
+filter_entry = min_price_entry = max_price_entry = filter_user_id_entry = advanced_price_range_entry = None
+has_images_var = has_video_var = None
+user_data_tree = user_data_view = actions_tree = None
+analytics_tree = analytics_chart = analytics_status = analytics_cache = None
+performance_tree = slow_query_text = None
+
+# Widgets for data management tab
+def build_management_tab():
+    global management_search_entry, management_tree, management_prev_button, management_next_button
+    ttk.Label(management_frame, text="Search:").grid(column=0, row=0, padx=10, pady=10)
+    management_search_entry = ttk.Entry(management_frame)
+    management_search_entry.grid(column=1, row=0, padx=10, pady=10)
+    management_search_button = ttk.Button(management_frame, text="Search", command=search_data)
+    management_search_button.grid(column=2, row=0, padx=10, pady=10)
+    management_clear_search_button = ttk.Button(management_frame, text="Clear Search", command=clear_search)
+    management_clear_search_button.grid(column=3, row=0, padx=10, pady=10)
+
+    management_view_details_button = ttk.Button(management_frame, text="View Details", command=view_details)
+    management_view_details_button.grid(column=1, row=1, padx=10, pady=10)
+    management_export_button = ttk.Button(management_frame, text="Export to CSV", command=export_data)
+    management_export_button.grid(column=0, row=1, padx=10, pady=10)
+
+    # Create a Treeview to display data in the management tab
+    management_tree = ttk.Treeview(management_frame, columns=columns, show='headings')
+    for col in columns:
+        management_tree.heading(col, text=col.capitalize(), command=lambda col=col: sort_by(col))
+    management_tree.grid(column=0, row=2, columnspan=4, padx=10, pady=10)
+
+    # Pagination buttons for the management tab
+    management_prev_button = ttk.Button(management_frame, text="Previous", command=lambda: load_data(current_page - 1))
+    management_prev_button.grid(column=0, row=3, padx=10, pady=10)
+    management_next_button = ttk.Button(management_frame, text="Next", command=lambda: load_data(current_page + 1))
+    management_next_button.grid(column=2, row=3, padx=10, pady=10)
+
+    fill_tree(management_tree, current_rows)
+    update_pagination(current_total_pages)
+    update_headings()
+
+# Widgets for filter tab; every criterion left empty matches all listings
+def build_filter_tab():
+    global filter_entry, min_price_entry, max_price_entry, filter_user_id_entry, has_images_var, has_video_var
+    ttk.Label(filter_frame, text="Filter by User Role:").grid(column=0, row=0, padx=10, pady=10)
+    filter_entry = ttk.Combobox(filter_frame, values=["", "Student", "Management"])
+    filter_entry.grid(column=1, row=0, padx=10, pady=10)
+
+    ttk.Label(filter_frame, text="Filter by Price Range:").grid(column=0, row=1, padx=10, pady=10)
+    ttk.Label(filter_frame, text="Min Price:").grid(column=0, row=2, padx=10, pady=10)
+    min_price_entry = ttk.Entry(filter_frame)
+    min_price_entry.grid(column=1, row=2, padx=10, pady=10)
+    ttk.Label(filter_frame, text="Max Price:").grid(column=0, row=3, padx=10, pady=10)
+    max_price_entry = ttk.Entry(filter_frame)
+    max_price_entry.grid(column=1, row=3, padx=10, pady=10)
+
+    ttk.Label(filter_frame, text="User ID:").grid(column=0, row=4, padx=10, pady=10)
+    filter_user_id_entry = ttk.Entry(filter_frame)
+    filter_user_id_entry.grid(column=1, row=4, padx=10, pady=10)
+    ttk.Label(filter_frame, text="Has Images:").grid(column=0, row=5, padx=10, pady=10)
+    has_images_var = tk.StringVar(value="Any")
+    ttk.Combobox(filter_frame, textvariable=has_images_var, values=["Any", "Yes", "No"], state="readonly").grid(column=1, row=5, padx=10, pady=10)
+    ttk.Label(filter_frame, text="Has Video:").grid(column=0, row=6, padx=10, pady=10)
+    has_video_var = tk.StringVar(value="Any")
+    ttk.Combobox(filter_frame, textvariable=has_video_var, values=["Any", "Yes", "No"], state="readonly").grid(column=1, row=6, padx=10, pady=10)
+
+    filter_button = ttk.Button(filter_frame, text="Apply Filters", command=apply_filters)
+    filter_button.grid(column=0, row=7, padx=10, pady=10)
+    clear_filters_button = ttk.Button(filter_frame, text="Clear Filters", command=clear_filters)
+    clear_filters_button.grid(column=1, row=7, padx=10, pady=10)
+
+# Widgets for advanced features tab
+def build_advanced_tab():
+    global advanced_price_range_entry
+    ttk.Label(advanced_frame, text="Advanced Search:").grid(column=0, row=0, padx=10, pady=10)
+    advanced_price_range_entry = ttk.Entry(advanced_frame)
+    advanced_price_range_entry.grid(column=1, row=0, padx=10, pady=10)
+    advanced_search_button = ttk.Button(advanced_frame, text="Search", command=advanced_search)
+    advanced_search_button.grid(column=2, row=0, padx=10, pady=10)
+
+    reset_button = ttk.Button(advanced_frame, text="Reset Database", command=reset_database)
+    reset_button.grid(column=0, row=1, padx=10, pady=10)
+
+    change_address_button = ttk.Button(advanced_frame, text="Change Address", command=change_address)
+    change_address_button.grid(column=1, row=1, padx=10, pady=10)
+
+# Widgets for user data tab
+def build_user_data_tab():
+    global user_data_tree, user_data_view
+    if conn is None:
+        ttk.Label(user_data_frame, text="All user data is only shown with a local database.").grid(column=0, row=0, padx=10, pady=10)
+        return
+    user_data_tree = ttk.Treeview(user_data_frame, columns=columns, show='headings')
+    for col in columns:
+        user_data_tree.heading(col, text=col.capitalize())
+    user_data_tree.grid(column=0, row=0, columnspan=4, padx=10, pady=10)
+    user_data_scrollbar = ttk.Scrollbar(user_data_frame, orient=tk.VERTICAL)
+    user_data_scrollbar.grid(column=4, row=0, sticky='ns', pady=10)
+    user_data_view = VirtualTreeview(user_data_tree, user_data_scrollbar, conn)
+    load_user_data()
+
+# Widgets for recent actions tab
+def build_actions_tab():
+    global actions_tree
+    actions_tree = ttk.Treeview(actions_frame, columns=("ID", "Action", "Timestamp"), show="headings")
+    actions_tree.heading("ID", text="ID")
+    actions_tree.heading("Action", text="Action")
+    actions_tree.heading("Timestamp", text="Timestamp")
+    actions_tree.grid(column=0, row=0, columnspan=4, padx=10, pady=10)
+    show_recent_actions_button = ttk.Button(actions_frame, text="Refresh", command=show_recent_actions)
+    show_recent_actions_button.grid(column=0, row=1, padx=10, pady=10)
+
+# Widgets for analytics tab
+def build_analytics_tab():
+    global analytics_tree, analytics_chart, analytics_status, analytics_cache
+    analytics_tree = ttk.Treeview(analytics_frame, columns=("Role", "Listings", "Average", "Min", "Max"), show="headings", height=4)
+    for col in ("Role", "Listings", "Average", "Min", "Max"):
+        analytics_tree.heading(col, text=col)
+    analytics_tree.grid(column=0, row=0, columnspan=4, padx=10, pady=10)
+    analytics_chart = tk.Label(analytics_frame)
+    analytics_chart.grid(column=0, row=1, columnspan=4, padx=10, pady=10)
+    analytics_refresh_button = ttk.Button(analytics_frame, text="Refresh", command=show_analytics)
+    analytics_refresh_button.grid(column=0, row=2, padx=10, pady=10)
+    analytics_status = ttk.Label(analytics_frame)
+    analytics_status.grid(column=1, row=2, padx=10, pady=10)
+    if db_manager is None:
+        analytics_cache = AnalyticsCache(window, fetch_stats=store.stats)
+    elif price_snapshot is not None:
+        analytics_cache = AnalyticsCache(window, lambda: db_manager.connect(readonly=True), price_snapshot.stats)
+    else:
+        analytics_cache = AnalyticsCache(window, lambda: db_manager.connect(readonly=True))
+
+# Widgets for performance tab
+def build_performance_tab():
+    global performance_tree, slow_query_text
+    performance_columns = ("Kind", "Name", "Calls", "Rows", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Total ms")
+    performance_tree = ttk.Treeview(performance_frame, columns=performance_columns, show="headings", height=14)
+    for col in performance_columns:
+        performance_tree.heading(col, text=col)
+        performance_tree.column(col, width=420 if col == "Name" else 75, anchor=tk.W if col in ("Kind", "Name") else tk.E)
+    performance_tree.grid(column=0, row=0, columnspan=4, padx=10, pady=10)
+    ttk.Label(performance_frame, text="Slow queries:").grid(column=0, row=1, padx=10, sticky='w')
+    slow_query_text = tk.Text(performance_frame, height=10, width=140, wrap=tk.NONE)
+    slow_query_text.grid(column=0, row=2, columnspan=4, padx=10, pady=5)
+    ttk.Button(performance_frame, text="Refresh", command=show_performance).grid(column=0, row=3, padx=10, pady=10)
+    ttk.Button(performance_frame, text="Reset", command=reset_performance).grid(column=1, row=3, padx=10, pady=10)
+    ttk.Button(performance_frame, text="Save as JSON", command=save_performance).grid(column=2, row=3, padx=10, pady=10)
+
+tab_builders = {
+    management_frame: build_management_tab,
+    filter_frame: build_filter_tab,
+    advanced_frame: build_advanced_tab,
+    user_data_frame: build_user_data_tab,
+    actions_frame: build_actions_tab,
+    analytics_frame: build_analytics_tab,
+    performance_frame: build_performance_tab,
+}
+
+# Function to build a tab the first time it is selected
+def on_tab_changed(event):
+    frame = window.nametowidget(notebook.select())
+    builder = tab_builders.pop(frame, None)
+    if builder is not None:
+        builder()
+    if frame is analytics_frame:
+        show_analytics()
+    elif frame is performance_frame:
+        show_performance()
+
+notebook.bind('<<NotebookTabChanged>>', on_tab_changed)
+if price_snapshot is not None:
+    listings.subscribe(on_price_snapshot_changed)
+listings.subscribe(on_listing_changed)
+listings.subscribe(lambda event, payload: search_cache.invalidate())
+startup_timing.mark("widgets")
+
+# Function to show the collected timings; refreshes itself every two seconds
+# while the Performance tab is selected
+def show_performance():
+    global performance_refresh
+    snapshot = monitor.snapshot()
+    performance_tree.delete(*performance_tree.get_children())
+    for entry in snapshot["timings"][:200]:
+        performance_tree.insert('', tk.END, values=(entry["kind"], entry["name"], entry["count"], entry["rows"], entry["p50_ms"],
+                                                    entry["p95_ms"], entry["p99_ms"], entry["max_ms"], entry["total_ms"]))
+    slow_query_text.delete('1.0', tk.END)
+    for query in reversed(snapshot["slow_queries"]):
+        slow_query_text.insert(tk.END, f"{query['time']}  {query['elapsed_ms']:.1f} ms  {query['rows']} rows  {query['sql']}\n"
+                                       f"    params: {query['params']}\n")
+        for step in query["plan"]:
+            slow_query_text.insert(tk.END, f"    plan: {step}\n")
+    if performance_refresh is not None:
+        window.after_cancel(performance_refresh)
+    performance_refresh = window.after(2000, refresh_performance)
+
+performance_refresh = None
+
+def refresh_performance():
+    global performance_refresh
+    performance_refresh = None
+    if notebook.select() == str(performance_frame):
+        show_performance()
+
+def reset_performance():
+    monitor.reset()
+    show_performance()
+
+def save_performance():
+    file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
+    if file_path:
+        monitor.dump(file_path)
+
+# Function to hash and render media recorded without renditions (added
+# before the media store, or by a bulk import), one small batch at a time: the
+# batch is read on the reader lane, rendered in the process pool while the Tk
+# thread polls, and recorded by a writer job
+def fill_media_metadata():
+    def render(rows):
+        if not rows:
+            return
+        futures = [media_store.submit(path, kind, copy=False) for media_id, kind, path in rows]
+        when_ingested(futures, lambda futures: db_worker.submit(
+            lambda db: record_renditions(db, [(row[0], ingest_result(future)) for row, future in zip(rows, futures)]),
+            lambda result: fill_media_metadata()))
+
+    db_worker.submit(lambda db: pending_renditions(db), render, readonly=True)
+
+# Function run once the first page is on screen: report the startup timing and
+# start the background work that was held back until then
+first_page_shown = False
+
+def on_first_page():
+    global first_page_shown
+    if first_page_shown:
+        return
+    first_page_shown = True
+    startup_timing.mark("first page shown")
+    startup_timing.report()
+    if db_manager is not None:
+        fill_media_metadata()
+    if price_snapshot is not None:
+        load_price_snapshot()
+
+# Initial data load: the first page comes before anything else
+db_worker.start(window)
+load_data()
+
+# Run the Tkinter event loop
+window.mainloop()
+
+# Close the database connections when done, flushing the pending action log first
+db_worker.stop()
+thumbnail_cache.close()
+media_store.close()
+store.close()
+monitor.stop_dump()
+if db_manager is not None:
+    db_manager.close()
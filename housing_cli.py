@@ -0,0 +1,178 @@
+import argparse
+import csv
+import json
+import sys
+
+from housing_store import HousingStore
+from listing_query import SORT_COLUMNS, ListingQuery
+from validation import ValidationError
+
+# Command line interface to the housing database, for batch jobs on machines
+# without a display.
+#
+#   python housing_cli.py [--database DB] import listings.csv
+#   python housing_cli.py export out.csv [--search TERM] [--role ROLE] [--min-price N] [--max-price N]
+#                                        [--user-id ID] [--has-images yes|no] [--has-video yes|no] [--sort COLUMN [--descending]]
+#   python housing_cli.py search "maple" [the same filters] [--limit N]
+#   python housing_cli.py stats [--json]
+#   python housing_cli.py vacuum
+#   python housing_cli.py ingest-media [--media-dir DIR] [--workers N]
+#   python housing_cli.py serve [--host HOST [--allow-remote]] [--port N] [--readers N]
+
+
+# Function to build the ListingQuery given by the filter options
+def _selection(args, text):
+    return ListingQuery.parse(text or '', args.role or '', args.min_price or '', args.max_price or '',
+                              args.user_id or '', args.has_images or '', args.has_video or '',
+                              sort=args.sort, descending=args.descending)
+
+
+def _add_filter_arguments(command, search=True):
+    if search:
+        command.add_argument("--search")
+    command.add_argument("--role")
+    command.add_argument("--min-price")
+    command.add_argument("--max-price")
+    command.add_argument("--user-id")
+    command.add_argument("--has-images", choices=["yes", "no"])
+    command.add_argument("--has-video", choices=["yes", "no"])
+    command.add_argument("--sort", choices=SORT_COLUMNS)
+    command.add_argument("--descending", action="store_true")
+
+
+def cmd_import(store, args):
+    def progress(processed):
+        print(f"{processed} records processed", file=sys.stderr)
+
+    result = store.import_file(args.file, batch_size=args.batch_size, progress=progress)
+    print(result.summary())
+    for line, error in result.errors:
+        print(f"record {line}: {error}", file=sys.stderr)
+    return 0
+
+
+def cmd_export(store, args):
+    selection = _selection(args, args.search)
+    if selection.is_empty(store.fts_enabled) and selection.sort is None:
+        written = store.export_csv(args.file)
+    else:
+        written = store.export_csv(args.file, *store.compile(selection))
+    print(f"Exported {written} listings to {args.file}")
+    return 0
+
+
+def cmd_search(store, args):
+    writer = csv.writer(sys.stdout, delimiter='\t', lineterminator='\n')
+    for count, row in enumerate(store.query(_selection(args, args.term)), start=1):
+        writer.writerow(row)
+        if args.limit and count >= args.limit:
+            break
+    return 0
+
+
+def cmd_stats(store, args):
+    stats = store.stats(bins=args.bins)
+    if args.json:
+        json.dump(stats, sys.stdout, indent=2)
+        print()
+        return 0
+    print(f"{'Role':<12} {'Listings':>9} {'Average':>10} {'Min':>10} {'Max':>10}")
+    for role, count, average, low, high in stats["roles"]:
+        print(f"{role or '(none)':<12} {count:>9} {average:>10.2f} {low:>10.2f} {high:>10.2f}")
+    return 0
+
+
+def cmd_ingest_media(store, args):
+    from media_store import MediaStore
+
+    media_store = MediaStore(args.media_dir, args.workers)
+    try:
+        processed = store.ingest_pending_media(media_store, progress=lambda total: print(f"{total} files processed", file=sys.stderr))
+    finally:
+        media_store.close(wait=True)
+    print(f"Rendered {processed} media files")
+    return 0
+
+
+def cmd_serve(store, args):
+    import asyncio
+
+    from api_server import ApiServer, is_loopback
+    from instrumentation import PerformanceMonitor
+
+    if not is_loopback(args.host) and not args.allow_remote:
+        raise ValidationError(f"{args.host} is reachable from other machines and the API has no authentication; "
+                              "pass --allow-remote to serve on it anyway.")
+    server = ApiServer(store, args.host, args.port, args.readers, monitor=PerformanceMonitor())
+    print(f"Serving {args.database} on http://{args.host}:{args.port} (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_vacuum(store, args):
+    before, after = store.vacuum()
+    print(f"Database compacted from {before / 1e6:.1f} MB to {after / 1e6:.1f} MB")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Student housing database tools")
+    parser.add_argument("--database", default="housing_extended.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("import", help="bulk import listings from a CSV or JSON lines file")
+    command.add_argument("file")
+    command.add_argument("--batch-size", type=int, default=10000)
+    command.set_defaults(handler=cmd_import)
+
+    command = commands.add_parser("export", help="export listings (all, or a search/filter result) to CSV")
+    command.add_argument("file")
+    _add_filter_arguments(command)
+    command.set_defaults(handler=cmd_export)
+
+    command = commands.add_parser("search", help="full-text search, printed as tab-separated rows")
+    command.add_argument("term")
+    _add_filter_arguments(command, search=False)
+    command.add_argument("--limit", type=int, default=0)
+    command.set_defaults(handler=cmd_search)
+
+    command = commands.add_parser("stats", help="price statistics per user role")
+    command.add_argument("--bins", type=int, default=20)
+    command.add_argument("--json", action="store_true")
+    command.set_defaults(handler=cmd_stats)
+
+    command = commands.add_parser("ingest-media", help="render thumbnails and web renditions of media that has none")
+    command.add_argument("--media-dir", default="media_store")
+    command.add_argument("--workers", type=int)
+    command.set_defaults(handler=cmd_ingest_media)
+
+    command = commands.add_parser("serve", help="serve the database over a local HTTP API (see api_server.py)")
+    command.add_argument("--host", default="127.0.0.1")
+    command.add_argument("--port", type=int, default=8765)
+    command.add_argument("--readers", type=int, default=4)
+    command.add_argument("--allow-remote", action="store_true",
+                         help="allow a --host other machines can reach (the API has no authentication)")
+    command.set_defaults(handler=cmd_serve)
+
+    command = commands.add_parser("vacuum", help="checkpoint, optimize and compact the database")
+    command.set_defaults(handler=cmd_vacuum)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = HousingStore(args.database)
+    try:
+        return args.handler(store, args)
+    except ValidationError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import os
+
+from action_log import ActionLogWriter
+from analytics import compute_stats
+from bulk_import import import_file
+from csv_export import ALL_ROWS_QUERY, export_csv, iter_chunks
+from db_connection import ConnectionManager
+from listing_query import ListingQuery
+from media import get_media, get_media_details, ingest_pending_media, set_media
+from migrations import migrate
+from search_index import SEARCH_COLUMNS, search_index_exists
+from validation import validate_listing
+
+# Headless service layer for the housing database.
+#
+# HousingStore holds every data operation of the application without any Tk
+# code, so the same logic serves the GUI, the command line (housing_cli.py) and
+# batch jobs. Inputs are ListingInput records, validated once when they are
+# built; queries return generators that stream rows from the cursor in chunks.
+#
+# Every method takes an optional conn. Without it the store's own connections
+# are used (the shared writer for mutations, a per-thread reader for queries);
+# the GUI passes the connection of the DB worker job the call runs in.
+LISTING_COLUMNS = "address, price, description, images, video, user_role, user_id"
+
+
+# A validated listing as entered in the form or given on the command line.
+# media maps file paths to the IngestedMedia records of files already in the
+# media store, whose metadata is then recorded without reading them again.
+class ListingInput:
+    __slots__ = ('address', 'price', 'description', 'images', 'video', 'user_role', 'user_id', 'media')
+
+    def __init__(self, address, price, description, images=(), video='', user_role='Student', user_id='', media=None):
+        self.address = address
+        self.price = price
+        self.description = description
+        self.images = list(images)
+        self.video = video or ''
+        self.user_role = user_role
+        self.user_id = user_id
+        self.media = media or {}
+
+    # Function to build a listing from raw text values; raises ValidationError
+    @classmethod
+    def parse(cls, address, price, description, images=(), video='', user_role='Student', user_id=''):
+        price = validate_listing(address, price, description, user_id)
+        return cls(address, price, description, images, video, user_role, user_id)
+
+    # Function to return the listing with its files replaced by their copies
+    # in the media store; ingested maps the original paths to IngestedMedia
+    def with_media(self, ingested):
+        def stored(path):
+            return ingested[path].path if path in ingested else path
+
+        media = {record.path: record for record in ingested.values()}
+        return ListingInput(self.address, self.price, self.description, [stored(path) for path in self.images],
+                            stored(self.video) if self.video else '', self.user_role, self.user_id, media)
+
+    def as_row(self):
+        return (self.address, self.price, self.description, ','.join(self.images), self.video, self.user_role, self.user_id)
+
+
+class HousingStore:
+    def __init__(self, database='housing_extended.db', manager=None, action_log=None):
+        self.manager = manager or ConnectionManager(database)
+        self.owns_manager = manager is None
+        migrate(self.manager.writer())
+        self.fts_enabled = search_index_exists(self.manager.writer())
+        self.action_log = action_log or ActionLogWriter(self.manager.connect())
+        self.owns_action_log = action_log is None
+
+    def _writer(self, conn):
+        return conn if conn is not None else self.manager.writer()
+
+    def _reader(self, conn):
+        return conn if conn is not None else self.manager.reader()
+
+    def log_action(self, action):
+        self.action_log.log(action)
+
+    # Mutations; each commits and returns the stored row where there is one
+
+    def add_listing(self, listing, conn=None):
+        db = self._writer(conn)
+        cursor = db.execute(f"INSERT INTO apartments ({LISTING_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", listing.as_row())
+        set_media(db, cursor.lastrowid, listing.images, listing.video, listing.media)
+        db.commit()
+        self.log_action(f"Added apartment at {listing.address}")
+        return self.get_listing(cursor.lastrowid, db)
+
+    # Returns None, without writing anything, if there is no such listing
+    def update_listing(self, listing_id, listing, conn=None):
+        db = self._writer(conn)
+        cursor = db.execute('''UPDATE apartments SET address=?, price=?, description=?, images=?, video=?, user_role=?,
+                               user_id=? WHERE id=?''', listing.as_row() + (listing_id,))
+        if cursor.rowcount == 0:
+            db.rollback()
+            return None
+        set_media(db, listing_id, listing.images, listing.video, listing.media)
+        db.commit()
+        self.log_action(f"Updated apartment at {listing.address}")
+        return self.get_listing(listing_id, db)
+
+    def change_address(self, listing_id, address, conn=None):
+        db = self._writer(conn)
+        db.execute("UPDATE apartments SET address=? WHERE id=?", (address, listing_id))
+        db.commit()
+        return self.get_listing(listing_id, db)
+
+    # Returns the number of listings deleted, 0 if there was no such listing
+    def delete_listing(self, listing_id, conn=None):
+        db = self._writer(conn)
+        deleted = db.execute("DELETE FROM apartments WHERE id=?", (listing_id,)).rowcount
+        db.commit()
+        if deleted:
+            self.log_action(f"Deleted apartment with ID {listing_id}")
+        return deleted
+
+    # Function to delete every listing. The schema, indexes and search triggers
+    # are kept; only the rows go.
+    def reset(self, conn=None):
+        db = self._writer(conn)
+        db.execute("DELETE FROM apartments")
+        db.execute("DELETE FROM sqlite_sequence WHERE name='apartments'")
+        db.commit()
+        self.log_action("Reset the database")
+
+    def import_file(self, path, batch_size=10000, progress=None, cancel_event=None, conn=None):
+        result = import_file(self._writer(conn), path, batch_size, progress, cancel_event)
+        self.log_action(f"Imported {result.imported} apartments from {os.path.basename(path)}")
+        return result
+
+    # Function to render the renditions of every media file that has none,
+    # with a media_store.MediaStore; returns the number of files processed
+    def ingest_pending_media(self, media_store, batch=50, progress=None):
+        db = self.manager.writer()
+        total = 0
+        while True:
+            processed = ingest_pending_media(db, media_store, batch)
+            if not processed:
+                return total
+            total += processed
+            if progress is not None:
+                progress(total)
+
+    # Queries. The *_query functions return (query, params), so a caller can
+    # keep the query of what it shows (e.g. to export exactly that); rows() runs
+    # one and yields its rows.
+
+    def rows(self, query, params=(), chunk_size=1000, conn=None):
+        for chunk in iter_chunks(self._reader(conn), query, params, chunk_size):
+            yield from chunk
+
+    # Function to compile a ListingQuery for this database (FTS5 or LIKE text
+    # matching, whichever it supports)
+    def compile(self, listing_query):
+        return listing_query.compile(use_fts=self.fts_enabled)
+
+    def query(self, listing_query, conn=None):
+        return self.rows(*self.compile(listing_query), conn=conn)
+
+    def search_query(self, term, min_price=None, max_price=None, columns=SEARCH_COLUMNS, user_role=None):
+        return self.compile(ListingQuery(term, user_role, min_price, max_price, text_columns=columns))
+
+    def role_query(self, user_role):
+        return self.compile(ListingQuery(user_role=user_role))
+
+    # min_price and max_price are strings as entered, '' for an open bound
+    def price_range_query(self, min_price, max_price):
+        return self.compile(ListingQuery.parse(min_price=min_price, max_price=max_price))
+
+    def search(self, term, min_price=None, max_price=None, columns=SEARCH_COLUMNS, user_role=None, conn=None):
+        return self.rows(*self.search_query(term, min_price, max_price, columns, user_role), conn=conn)
+
+    def by_role(self, user_role, conn=None):
+        return self.rows(*self.role_query(user_role), conn=conn)
+
+    def by_price_range(self, min_price, max_price, conn=None):
+        return self.rows(*self.price_range_query(min_price, max_price), conn=conn)
+
+    def get_listing(self, listing_id, conn=None):
+        return self._reader(conn).execute("SELECT * FROM apartments WHERE id=?", (listing_id,)).fetchone()
+
+    def get_media(self, listing_id, kind='image', conn=None):
+        return get_media(self._reader(conn), listing_id, kind)
+
+    def get_media_details(self, listing_id, conn=None):
+        return get_media_details(self._reader(conn), listing_id)
+
+    def listing_ids(self, conn=None):
+        return (row[0] for row in self._reader(conn).execute("SELECT id FROM apartments ORDER BY id"))
+
+    def recent_actions(self, limit=100, conn=None):
+        return self.rows("SELECT * FROM actions ORDER BY timestamp DESC LIMIT ?", (limit,), conn=conn)
+
+    def stats(self, bins=20, conn=None):
+        return compute_stats(self._reader(conn), bins)
+
+    # Function to write the result of a query (all listings by default) to a CSV
+    # file; returns the number of rows written
+    def export_csv(self, file_path, query=ALL_ROWS_QUERY[0], params=(), progress=None, cancel_event=None, conn=None):
+        return export_csv(self._reader(conn), file_path, query, params, progress=progress, cancel_event=cancel_event)
+
+    # Function to compact the database: checkpoint the WAL, optimize the
+    # full-text index and rebuild the file. Returns the file size before and after.
+    def vacuum(self):
+        self.action_log.flush()
+        db = self.manager.writer()
+        db.commit()
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_before = os.path.getsize(self.manager.database)
+        if self.fts_enabled:
+            db.execute("INSERT INTO apartments_fts(apartments_fts) VALUES('optimize')")
+            db.commit()
+        db.execute("VACUUM")
+        db.execute("PRAGMA optimize")
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return size_before, os.path.getsize(self.manager.database)
+
+    def close(self):
+        if self.owns_action_log:
+            self.action_log.close()
+        if self.owns_manager:
+            self.manager.close()
@@ -0,0 +1,243 @@
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, timezone
+
+# Always-on performance instrumentation.
+#
+# PerformanceMonitor keeps a latency histogram for every distinct SQL statement
+# and every Tk handler. Histograms have fixed logarithmic buckets (about 19%
+# wide from 10 us to 100 s), so recording a sample is a bisect and two
+# additions, and memory does not grow with the number of samples.
+#
+# SQL is measured by connections created with factory=InstrumentedConnection
+# (ConnectionManager does this when it is given a monitor). execute() and the
+# fetch calls are timed separately: "execute" is the time to the first row,
+# "fetch" the time spent pulling rows with fetchone/fetchmany/fetchall, which
+# also gives the row counts (rows read by iterating a cursor are not counted).
+# A statement slower than slow_ms is kept with its parameters and its
+# EXPLAIN QUERY PLAN, captured once per statement text.
+#
+# Handlers are measured with the handler decorator: "handler" is the time the
+# Tk thread spent in the handler itself, and for every DB worker job it
+# submits, "job" is the time the job ran and "round trip" the time from
+# submit until the done callback returned, i.e. what the user waited for.
+#
+# snapshot() returns everything as a JSON-ready dict; start_dump() writes it to
+# a file periodically. HOUSING_SLOW_QUERY_MS sets the slow-query threshold and
+# HOUSING_PERF_DUMP (with HOUSING_PERF_DUMP_INTERVAL seconds) enables the dump.
+BUCKET_BOUNDS = [0.01 * 2 ** (i / 4) for i in range(94)]  # milliseconds
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'count', 'total', 'max', 'rows')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def record(self, elapsed_ms, rows=0):
+        self.counts[bisect_left(BUCKET_BOUNDS, elapsed_ms)] += 1
+        self.count += 1
+        self.total += elapsed_ms
+        self.rows += rows
+        if elapsed_ms > self.max:
+            self.max = elapsed_ms
+
+    # Upper bound of the bucket holding the given fraction of the samples
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "rows": self.rows,
+            "total_ms": round(self.total, 3),
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class PerformanceMonitor:
+    def __init__(self, slow_ms=None, max_slow=50):
+        self.slow_ms = slow_ms if slow_ms is not None else float(os.environ.get("HOUSING_SLOW_QUERY_MS", 100))
+        self.histograms = {}
+        self.slow_queries = deque(maxlen=max_slow)
+        self.plans = {}
+        self.lock = threading.Lock()
+        self.current_handler = None
+        self.started = time.time()
+        self.dump_thread = None
+        self.dump_stop = threading.Event()
+
+    # Function to add one sample; kind is 'execute', 'fetch', 'handler', 'job'
+    # or 'round trip'. Safe to call from any thread.
+    def record(self, kind, name, elapsed_ms, rows=0):
+        key = (kind, name)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(elapsed_ms, rows)
+
+    def record_slow(self, conn, sql, params, elapsed_ms, rows):
+        plan = self.plans.get(sql)
+        if plan is None and params is not None:
+            try:
+                plan = [row[-1] for row in sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params)]
+            except sqlite3.Error:
+                plan = []
+            self.plans[sql] = plan
+        with self.lock:
+            self.slow_queries.append({
+                "time": datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+                "sql": sql,
+                "params": repr(params)[:200],
+                "elapsed_ms": round(elapsed_ms, 3),
+                "rows": rows,
+                "plan": plan or [],
+            })
+
+    # Decorator for Tk handlers; jobs submitted while the handler runs are
+    # attributed to it by DBWorker
+    def handler(self, fn):
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            outer = self.current_handler
+            self.current_handler = name
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record('handler', name, (time.perf_counter() - start) * 1000)
+                self.current_handler = outer
+        return wrapper
+
+    def snapshot(self):
+        with self.lock:
+            entries = [dict(kind=kind, name=name, **histogram.summary())
+                       for (kind, name), histogram in self.histograms.items()]
+            slow = list(self.slow_queries)
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return {
+            "created": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "uptime_s": round(time.time() - self.started, 1),
+            "slow_query_ms": self.slow_ms,
+            "timings": entries,
+            "slow_queries": slow,
+        }
+
+    def dump(self, path):
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(temp_path, path)
+
+    # Function to write snapshot() to path every interval seconds on a daemon
+    # thread, and once more when stop_dump() is called
+    def start_dump(self, path, interval=60.0):
+        def run():
+            while not self.dump_stop.wait(interval):
+                self.dump(path)
+            self.dump(path)
+
+        self.dump_thread = threading.Thread(target=run, name="perf-dump", daemon=True)
+        self.dump_thread.start()
+
+    def stop_dump(self):
+        if self.dump_thread is not None:
+            self.dump_stop.set()
+            self.dump_thread.join()
+            self.dump_thread = None
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.slow_queries.clear()
+
+
+_statement_names = {}
+
+
+# Statement text with whitespace collapsed, cached since the application only
+# issues a few hundred distinct statements
+def _statement_name(sql):
+    name = _statement_names.get(sql)
+    if name is None:
+        if len(_statement_names) > 10000:
+            _statement_names.clear()
+        name = _statement_names[sql] = _WHITESPACE_RE.sub(" ", sql).strip()
+    return name
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def _timed(self, method, sql, params):
+        monitor = self.connection.monitor
+        start = time.perf_counter()
+        result = method(self, sql, params)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.statement = name = _statement_name(sql)
+        rows = max(self.rowcount, 0)
+        monitor.record('execute', name, elapsed, rows)
+        if elapsed >= monitor.slow_ms:
+            monitor.record_slow(self.connection, sql, params if method is sqlite3.Cursor.execute else None, elapsed, rows)
+        return result
+
+    def execute(self, sql, params=()):
+        return self._timed(sqlite3.Cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._timed(sqlite3.Cursor.executemany, sql, seq_of_params)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        rows = method(self, *args)
+        statement = getattr(self, "statement", None)
+        if statement is not None:
+            count = len(rows) if isinstance(rows, list) else int(rows is not None)
+            self.connection.monitor.record('fetch', statement, (time.perf_counter() - start) * 1000, count)
+        return rows
+
+    def fetchone(self):
+        return self._fetch(sqlite3.Cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(sqlite3.Cursor.fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(sqlite3.Cursor.fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    monitor = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
@@ -0,0 +1,155 @@
+from pagination import seek_conditions, seek_query
+from search_index import SEARCH_COLUMNS, build_match_query
+from validation import ValidationError, validate_price_range
+
+# Composable filter and sort for listings.
+#
+# A ListingQuery holds any combination of: text (FTS5 prefix terms, or LIKE
+# substrings without FTS5), user role, price range, user id, has images, has
+# video, plus a sort column and direction, and compiles them into one
+# parameterized query. The SQL text depends only on which criteria are set,
+# never on their values, and the conditions always come in the same order, so
+# the application issues a few dozen distinct statements at most and every
+# repeated search is a hit in sqlite3's statement cache (cached_statements in
+# db_connection) instead of a new prepare.
+#
+# Text without a sort column is ordered by relevance (the FTS5 rank). Any other
+# order is (column, id), which the column indexes (see migrations) return
+# without sorting; KeysetPaginator pages through the same conditions with
+# where(alias='') and seeks on that key, so sorting by a Treeview heading reads
+# one page of the index instead of fetching and sorting every row.
+SORT_COLUMNS = ('id', 'address', 'price', 'description', 'images', 'video', 'user_role', 'user_id')
+
+_FLAGS = {'yes': True, 'no': False}
+
+
+class ListingQuery:
+    __slots__ = ('text', 'text_columns', 'user_role', 'min_price', 'max_price', 'user_id',
+                 'has_images', 'has_video', 'sort', 'descending')
+
+    def __init__(self, text='', user_role=None, min_price=None, max_price=None, user_id=None,
+                 has_images=None, has_video=None, sort=None, descending=False, text_columns=SEARCH_COLUMNS):
+        if sort is not None and sort not in SORT_COLUMNS:
+            raise ValidationError(f"Cannot sort by {sort!r}; choose one of {', '.join(SORT_COLUMNS)}.")
+        self.text = text.strip() if text else ''
+        self.text_columns = tuple(text_columns)
+        self.user_role = user_role or None
+        self.min_price = min_price
+        self.max_price = None if max_price == float('inf') else max_price
+        self.user_id = user_id or None
+        self.has_images = has_images
+        self.has_video = has_video
+        self.sort = sort
+        self.descending = descending
+
+    # Function to build a query from form values: strings, '' for "any".
+    # has_images and has_video take 'Yes' or 'No'. Raises ValidationError.
+    @classmethod
+    def parse(cls, text='', user_role='', min_price='', max_price='', user_id='', has_images='', has_video='', **options):
+        low, high = validate_price_range(min_price, max_price)
+        return cls(text, user_role.strip(), low if str(min_price).strip() else None, high, str(user_id).strip(),
+                   _FLAGS.get(str(has_images).strip().lower()), _FLAGS.get(str(has_video).strip().lower()), **options)
+
+    # Function to return a copy with some criteria changed
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return ListingQuery(**values)
+
+    # Whether no row is filtered out
+    def is_empty(self, use_fts=True):
+        return self.where(use_fts, alias='')[0] == ''
+
+    # The FTS5 query for the text, or None without searchable words
+    def match(self):
+        if not self.text:
+            return None
+        return build_match_query(self.text, None if self.text_columns == SEARCH_COLUMNS else self.text_columns)
+
+    # Whether compile() orders the result by relevance
+    def ranked(self, use_fts=True):
+        return use_fts and self.sort is None and self.match() is not None
+
+    # Function to compile the conditions into a WHERE clause without the
+    # keyword; returns (clause, params), the clause is '' without conditions.
+    # alias is the outer query's name for apartments ('' for none); with
+    # joined, the outer query joins apartments_fts and matches it directly.
+    def where(self, use_fts=True, alias='a', joined=False):
+        prefix = alias + '.' if alias else ''
+        conditions, params = [], []
+        if use_fts:
+            match = self.match()
+            if match is not None:
+                conditions.append("apartments_fts MATCH ?" if joined else
+                                  f"{prefix}id IN (SELECT rowid FROM apartments_fts WHERE apartments_fts MATCH ?)")
+                params.append(match)
+        elif self.text:
+            conditions.append("(" + " OR ".join(f"{prefix}{col} LIKE ?" for col in self.text_columns) + ")")
+            params += ['%' + self.text + '%'] * len(self.text_columns)
+        if self.user_role is not None:
+            conditions.append(f"{prefix}user_role = ?")
+            params.append(self.user_role)
+        if self.min_price is not None and self.max_price is not None:
+            conditions.append(f"{prefix}price BETWEEN ? AND ?")
+            params += [self.min_price, self.max_price]
+        elif self.min_price is not None:
+            conditions.append(f"{prefix}price >= ?")
+            params.append(self.min_price)
+        elif self.max_price is not None:
+            conditions.append(f"{prefix}price <= ?")
+            params.append(self.max_price)
+        if self.user_id is not None:
+            conditions.append(f"{prefix}user_id = ?")
+            params.append(self.user_id)
+        for kind, wanted in (('image', self.has_images), ('video', self.has_video)):
+            if wanted is not None:
+                conditions.append(f"{'' if wanted else 'NOT '}EXISTS (SELECT 1 FROM apartment_media m "
+                                  f"WHERE m.apartment_id = {alias or 'apartments'}.id AND m.kind = '{kind}')")
+        return " AND ".join(conditions), params
+
+    # The sort key as column names, always ending with the unique id
+    def sort_key(self):
+        if self.sort in (None, 'id'):
+            return ('id',)
+        return (self.sort, 'id')
+
+    def order_by(self, alias='a'):
+        prefix = alias + '.' if alias else ''
+        direction = " DESC" if self.descending else ""
+        return ", ".join(prefix + col + direction for col in self.sort_key())
+
+    # Function to compile the whole query; returns (query, params)
+    def compile(self, use_fts=True):
+        if self.ranked(use_fts):
+            where, params = self.where(use_fts, joined=True)
+            query = (f"SELECT a.* FROM apartments_fts JOIN apartments a ON a.id = apartments_fts.rowid "
+                     f"WHERE {where} ORDER BY apartments_fts.rank")
+            return query, tuple(params)
+        where, params = self.where(use_fts)
+        query = "SELECT a.* FROM apartments a" + (f" WHERE {where}" if where else "")
+        if self.sort is not None:
+            query += " ORDER BY " + self.order_by()
+        return query, tuple(params)
+
+    # Function to compile one page of the query; returns (query, params).
+    # Pages in (sort column, id) order start after the key values in after
+    # (None for the first page), read with an index seek like KeysetPaginator;
+    # relevance order cannot be seeked and skips offset rows instead.
+    def compile_page(self, use_fts=True, after=None, offset=0, limit=50):
+        if self.ranked(use_fts):
+            query, params = self.compile(use_fts)
+            return query + " LIMIT ? OFFSET ?", params + (limit, offset)
+        where, params = self.where(use_fts)
+        if after is not None:
+            return seek_query("SELECT a.* FROM apartments a", where, params,
+                              seek_conditions(self.sort_key(), after, self.descending, prefix='a.'), self.order_by(), limit)
+        query = "SELECT a.* FROM apartments a" + (f" WHERE {where}" if where else "")
+        query += f" ORDER BY {self.order_by()} LIMIT ?"
+        if offset:
+            query += " OFFSET ?"
+            return query, tuple(params) + (limit, offset)
+        return query, tuple(params) + (limit,)
+
+    # The key values of a row in this query's order, for compile_page's after
+    def key_of(self, row):
+        return tuple(row[SORT_COLUMNS.index(col)] for col in self.sort_key())
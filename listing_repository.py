@@ -0,0 +1,60 @@
+# Listing repository with change notifications.
+#
+# Mutations are applied to the views as deltas instead of re-querying. Every
+# change is published to the subscribed views as one event:
+#   ('insert', listing), ('update', listing), ('delete', listing_id) or ('reset', None)
+# so each view patches only the affected item. All methods run on the Tk thread;
+# the mutation jobs on the DB worker return the changed row and the handlers'
+# done callbacks apply it here. version is bumped on every change, so caches
+# built from the table (e.g. the analytics) know when they are stale. Rows are
+# not kept here: the views hold what is on screen, and a cache of every row
+# ever fetched would grow with each search.
+FIELDS = ('id', 'address', 'price', 'description', 'images', 'video', 'user_role', 'user_id')
+
+
+class Listing:
+    __slots__ = FIELDS
+
+    def __init__(self, id, address, price, description, images, video, user_role, user_id):
+        self.id = id
+        self.address = address
+        self.price = price
+        self.description = description
+        self.images = images
+        self.video = video
+        self.user_role = user_role
+        self.user_id = user_id
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def as_row(self):
+        return (self.id, self.address, self.price, self.description, self.images, self.video, self.user_role, self.user_id)
+
+
+class ListingRepository:
+    def __init__(self):
+        self.listeners = []
+        self.version = 0
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def _publish(self, event, payload):
+        self.version += 1
+        for listener in self.listeners:
+            listener(event, payload)
+
+    def apply_insert(self, row):
+        self._publish('insert', Listing.from_row(row))
+
+    def apply_update(self, row):
+        self._publish('update', Listing.from_row(row))
+
+    def apply_delete(self, listing_id):
+        self._publish('delete', int(listing_id))
+
+    # Function to tell the views to reload, e.g. after a reset or bulk import
+    def apply_reset(self):
+        self._publish('reset', None)
@@ -0,0 +1,179 @@
+import hashlib
+import os
+
+# Normalized media storage.
+#
+# Every image or video attached to a listing is one row of apartment_media,
+# ordered by position, with the file's size, dimensions and SHA-256 content
+# hash. Files with the same content are deduplicated: all listings point at the
+# first stored copy. apartments.images is still filled with the joined paths for
+# the Treeview column and the search index, but is never parsed back; the media
+# rows are the source of truth.
+#
+# Files ingested by media_store also have their renditions recorded: web_path
+# and thumb_path (for a video, its poster frame) and a video's duration.
+# Media without them is rendered in the background (ingest_pending_media).
+MEDIA_COLUMNS = "apartment_id, position, kind, path, size, width, height, content_hash"
+RENDITION_COLUMNS = "web_path, thumb_path, duration"
+
+
+def create_media_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS apartment_media
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, apartment_id INTEGER NOT NULL, position INTEGER NOT NULL,
+                     kind TEXT NOT NULL, path TEXT NOT NULL, size INTEGER, width INTEGER, height INTEGER, content_hash TEXT)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_apartment_media_apartment ON apartment_media (apartment_id, kind, position)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_apartment_media_hash ON apartment_media (content_hash)")
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS apartment_media_ad AFTER DELETE ON apartments BEGIN
+                        DELETE FROM apartment_media WHERE apartment_id = old.id;
+                    END''')
+
+
+# The partial index only holds media still waiting for renditions, so finding
+# the next batch does not scan the rows already done
+def add_rendition_columns(conn):
+    for column, column_type in (("web_path", "TEXT"), ("thumb_path", "TEXT"), ("duration", "REAL")):
+        conn.execute(f"ALTER TABLE apartment_media ADD COLUMN {column} {column_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_apartment_media_pending ON apartment_media (id) WHERE thumb_path IS NULL")
+
+
+def split_legacy_paths(images):
+    return [path for path in (images or '').split(',') if path]
+
+
+# Function to read size, dimensions and content hash of a file; missing files
+# give (None, None, None, None)
+def file_metadata(path):
+    try:
+        size = os.path.getsize(path)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    except OSError:
+        return None, None, None, None
+    width = height = None
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            width, height = img.size
+    except Exception:
+        pass
+    return size, width, height, digest.hexdigest()
+
+
+# Function to build the media row for a file, reusing the stored copy of a file
+# with the same content if there is one. Files already ingested (in known, or
+# the IngestedMedia records in ingested) are not read again.
+def _media_row(conn, apartment_id, position, kind, path, known, ingested):
+    if path in known:
+        return (apartment_id, position, kind) + known[path]
+    if path in ingested:
+        return (apartment_id, position, kind) + ingested[path].media_values()
+    size, width, height, content_hash = file_metadata(path)
+    renditions = (None, None, None)
+    if content_hash is not None:
+        existing = conn.execute(f"SELECT path, size, width, height, {RENDITION_COLUMNS} FROM apartment_media "
+                                "WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+        if existing is not None:
+            path, size, width, height = existing[:4]
+            renditions = existing[4:]
+    return (apartment_id, position, kind, path, size, width, height, content_hash) + tuple(renditions)
+
+
+# Function to set the media of a listing. Only rows that actually changed are
+# deleted or inserted, and unchanged files are not hashed again. ingested maps
+# paths to the IngestedMedia records media_store made for them.
+def set_media(conn, apartment_id, image_paths, video_path=None, ingested=None):
+    wanted = [('image', path) for path in image_paths if path]
+    if video_path:
+        wanted.append(('video', video_path))
+
+    current = conn.execute(f"SELECT id, {MEDIA_COLUMNS}, {RENDITION_COLUMNS} FROM apartment_media "
+                           "WHERE apartment_id = ? ORDER BY kind, position", (apartment_id,)).fetchall()
+    known = {row[4]: row[4:] for row in current}
+    current_keys = [(row[3], row[4], row[2]) for row in current]
+    wanted_keys = []
+    positions = {}
+    for kind, path in wanted:
+        positions[kind] = positions.get(kind, -1) + 1
+        wanted_keys.append((kind, path, positions[kind]))
+
+    stale = [(row[0],) for row, key in zip(current, current_keys) if key not in wanted_keys]
+    if stale:
+        conn.executemany("DELETE FROM apartment_media WHERE id = ?", stale)
+    new_rows = [_media_row(conn, apartment_id, position, kind, path, known, ingested or {})
+                for kind, path, position in wanted_keys if (kind, path, position) not in current_keys]
+    if new_rows:
+        conn.executemany(f"INSERT INTO apartment_media ({MEDIA_COLUMNS}, {RENDITION_COLUMNS}) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", new_rows)
+
+
+# Function to add media rows for listings inserted in bulk (ids > last_id).
+# image_paths holds the list of image paths of each listing in insert order;
+# without it they are split from the images column, which only works for
+# paths without commas. Files are not read here; size, hash and renditions
+# stay empty until ingest_pending_media renders them.
+def index_bulk_media(conn, last_id, image_paths=None):
+    listings = conn.execute("SELECT id, images, video FROM apartments WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+    if image_paths is None:
+        image_paths = [split_legacy_paths(images) for _, images, _ in listings]
+    rows = []
+    for (apartment_id, _, video), paths in zip(listings, image_paths):
+        for position, path in enumerate(paths):
+            rows.append((apartment_id, position, 'image', path, None, None, None, None))
+        if video:
+            rows.append((apartment_id, 0, 'video', video, None, None, None, None))
+    conn.executemany(f"INSERT INTO apartment_media ({MEDIA_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+# Functions to render media recorded without renditions (added before the
+# media store existed, or by a bulk import); the files stay where they are. An
+# empty thumb_path marks media that has no rendition (unreadable files, or
+# video without ffmpeg), so it is not tried again.
+def pending_renditions(conn, batch=50):
+    return conn.execute("SELECT id, kind, path FROM apartment_media WHERE thumb_path IS NULL LIMIT ?", (batch,)).fetchall()
+
+
+# results are (media id, IngestedMedia or None if it could not be ingested)
+def record_renditions(conn, results):
+    updates = []
+    for media_id, media in results:
+        if media is None:
+            updates.append((-1, None, None, None, None, '', None, media_id))
+        else:
+            updates.append((media.size, media.width, media.height, media.content_hash, media.web_path,
+                            media.thumb_path or '', media.duration, media_id))
+    conn.executemany('''UPDATE apartment_media SET size = ?, width = ?, height = ?, content_hash = ?,
+                        web_path = ?, thumb_path = ?, duration = ? WHERE id = ?''', updates)
+    conn.commit()
+
+
+# Function to render one batch with a media_store.MediaStore and wait for it;
+# returns the number of rows processed
+def ingest_pending_media(conn, media_store, batch=50):
+    rows = pending_renditions(conn, batch)
+    futures = [(media_id, media_store.submit(path, kind, copy=False)) for media_id, kind, path in rows]
+    record_renditions(conn, [(media_id, ingest_result(future)) for media_id, future in futures])
+    return len(rows)
+
+
+# The IngestedMedia of a finished ingestion, or None if the file was rejected
+def ingest_result(future):
+    try:
+        return future.result()
+    except ValueError:
+        return None
+
+
+def get_media(conn, apartment_id, kind='image'):
+    return [row[0] for row in conn.execute(
+        "SELECT path FROM apartment_media WHERE apartment_id = ? AND kind = ? ORDER BY position", (apartment_id, kind))]
+
+
+# Function to return the media of a listing with its renditions, as rows of
+# (kind, path, thumb_path, web_path, width, height, duration), images first
+def get_media_details(conn, apartment_id):
+    return conn.execute('''SELECT kind, path, thumb_path, web_path, width, height, duration FROM apartment_media
+                           WHERE apartment_id = ? ORDER BY kind = 'video', position''', (apartment_id,)).fetchall()
+
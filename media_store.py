@@ -0,0 +1,232 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from validation import ValidationError
+
+# Content-addressed store for uploaded images and video.
+#
+# An upload is copied into the store under the SHA-256 of its content
+# (originals/ab/abcdef....jpg), hashing while copying, so the same photo
+# uploaded twice is stored once and a file chosen from a removable drive stays
+# available. Images are validated by decoding them and get two JPEG renditions,
+# a web-sized one (at most 1280px) and a thumbnail (at most 200px), written
+# next to the originals under web/ and thumbs/ with the same name. Videos get
+# their duration and frame size from ffprobe and a poster frame from ffmpeg,
+# rendered the same way, when those tools are installed; otherwise only the
+# copy, size and hash.
+#
+# Decoding and resizing are CPU-bound, so ingestion runs in a process pool
+# (spawned, not forked, since the GUI process has Tk and worker threads). A
+# spawned worker runs the parent's main script again, so a script using the
+# pool keeps its work under an `if __name__ == '__main__':` guard (see
+# main.py). A file whose renditions already exist is not decoded again.
+# submit() returns a Future of an IngestedMedia record; ingest() waits for a
+# list of them.
+WEB_SIZE = (1280, 1280)
+THUMB_SIZE = (200, 200)
+IMAGE_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF', 'BMP')
+
+
+class IngestedMedia:
+    __slots__ = ('kind', 'source', 'path', 'size', 'width', 'height', 'content_hash', 'web_path', 'thumb_path', 'duration')
+
+    def __init__(self, kind, source, path, size, width, height, content_hash, web_path=None, thumb_path=None, duration=None):
+        self.kind = kind
+        self.source = source
+        self.path = path
+        self.size = size
+        self.width = width
+        self.height = height
+        self.content_hash = content_hash
+        self.web_path = web_path
+        self.thumb_path = thumb_path
+        self.duration = duration
+
+    # The values of media.MEDIA_COLUMNS and media.RENDITION_COLUMNS after
+    # (apartment_id, position, kind)
+    def media_values(self):
+        return (self.path, self.size, self.width, self.height, self.content_hash, self.web_path, self.thumb_path, self.duration)
+
+
+def _store_path(root, folder, content_hash, extension):
+    return os.path.join(root, folder, content_hash[:2], content_hash + extension)
+
+
+# Function to copy a file into the store, hashing it on the way; returns
+# (stored path, size, content hash, whether this call created the stored
+# file). With copy=False the file is only hashed and stays where it is.
+def _copy_in(root, path, copy=True):
+    extension = os.path.splitext(path)[1].lower()
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = None
+    try:
+        with open(path, 'rb') as source:
+            if copy:
+                os.makedirs(os.path.join(root, 'originals'), exist_ok=True)
+                handle, temp_path = tempfile.mkstemp(dir=os.path.join(root, 'originals'), suffix='.tmp')
+                with os.fdopen(handle, 'wb') as target:
+                    for block in iter(lambda: source.read(1 << 20), b''):
+                        digest.update(block)
+                        target.write(block)
+                        size += len(block)
+            else:
+                for block in iter(lambda: source.read(1 << 20), b''):
+                    digest.update(block)
+                    size += len(block)
+    except OSError as exc:
+        if temp_path is not None:
+            os.remove(temp_path)
+        raise ValidationError(f"Cannot read {os.path.basename(path)}: {exc.strerror or exc}")
+    content_hash = digest.hexdigest()
+    if not copy:
+        return path, size, content_hash, False
+    stored = _store_path(root, 'originals', content_hash, extension)
+    if os.path.exists(stored):
+        os.remove(temp_path)
+        return stored, size, content_hash, False
+    os.makedirs(os.path.dirname(stored), exist_ok=True)
+    os.replace(temp_path, stored)
+    return stored, size, content_hash, True
+
+
+def _save_jpeg(image, path, quality=85):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(temp_path, 'JPEG', quality=quality, optimize=True)
+    os.replace(temp_path, path)
+
+
+# Function to write the web and thumbnail renditions of a decoded image
+def _render(image, web_path, thumb_path):
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail(WEB_SIZE)
+    _save_jpeg(image, web_path)
+    image.thumbnail(THUMB_SIZE)
+    _save_jpeg(image, thumb_path)
+
+
+# Runs in a pool process: copy, validate and render one image
+def ingest_image(root, path, copy=True):
+    from PIL import Image, ImageOps
+
+    stored, size, content_hash, created = _copy_in(root, path, copy)
+    web_path = _store_path(root, 'web', content_hash, '.jpg')
+    thumb_path = _store_path(root, 'thumbs', content_hash, '.jpg')
+    try:
+        with Image.open(stored) as image:
+            if image.format not in IMAGE_FORMATS:
+                raise ValueError(f"unsupported format {image.format}")
+            width, height = image.size
+            if image.getexif().get(0x0112) in (5, 6, 7, 8):  # EXIF orientation: rotated a quarter turn
+                width, height = height, width
+            if not (os.path.exists(web_path) and os.path.exists(thumb_path)):
+                if image.format == 'JPEG':
+                    image.draft('RGB', WEB_SIZE)
+                _render(ImageOps.exif_transpose(image), web_path, thumb_path)
+    except Exception as exc:
+        # A stored original this call did not create may belong to other listings
+        if created:
+            os.remove(stored)
+        raise ValidationError(f"{os.path.basename(path)} is not a valid image.") from exc
+    return IngestedMedia('image', path, stored, size, width, height, content_hash, web_path, thumb_path)
+
+
+# Function to read (duration, width, height) of a video with ffprobe; Nones
+# where it is not installed or cannot read the file
+def probe_video(path):
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is None:
+        return None, None, None
+    try:
+        output = subprocess.run([ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+                                 'stream=width,height:format=duration', '-of', 'json', path],
+                                capture_output=True, text=True, timeout=60, check=True).stdout
+        info = json.loads(output)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None, None, None
+    stream = (info.get('streams') or [{}])[0]
+    duration = info.get('format', {}).get('duration')
+    return float(duration) if duration else None, stream.get('width'), stream.get('height')
+
+
+# Runs in a pool process: copy one video, read its metadata and render a
+# poster frame from a second in (or the middle of shorter clips)
+def ingest_video(root, path, copy=True):
+    from PIL import Image
+
+    stored, size, content_hash, _ = _copy_in(root, path, copy)
+    duration, width, height = probe_video(stored)
+    web_path = _store_path(root, 'web', content_hash, '.jpg')
+    thumb_path = _store_path(root, 'thumbs', content_hash, '.jpg')
+    ffmpeg = shutil.which('ffmpeg')
+    if not (os.path.exists(web_path) and os.path.exists(thumb_path)) and ffmpeg is not None and duration is not None:
+        handle, frame_path = tempfile.mkstemp(suffix='.png')
+        os.close(handle)
+        try:
+            subprocess.run([ffmpeg, '-v', 'error', '-y', '-ss', str(min(1.0, duration / 2)), '-i', stored,
+                            '-frames:v', '1', frame_path], capture_output=True, timeout=120, check=True)
+            with Image.open(frame_path) as frame:
+                _render(frame, web_path, thumb_path)
+        except (OSError, subprocess.SubprocessError):
+            pass
+        finally:
+            os.remove(frame_path)
+    if not os.path.exists(thumb_path):
+        web_path = thumb_path = None
+    return IngestedMedia('video', path, stored, size, width, height, content_hash, web_path, thumb_path, duration)
+
+
+class MediaStore:
+    def __init__(self, root='media_store', workers=None):
+        self.root = os.path.abspath(root)
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.pool = None
+
+    # The pool is started on first use, so opening the application does not
+    # pay for spawning the worker processes
+    def _pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.pool
+
+    # Function to start ingesting a file; kind is 'image' or 'video'. With
+    # copy=False the file is left in place and only hashed and rendered.
+    def submit(self, path, kind='image', copy=True):
+        return self._pool().submit(ingest_video if kind == 'video' else ingest_image, self.root, path, copy)
+
+    # Function to ingest (kind, path) pairs and wait for all of them; raises
+    # the first ValidationError
+    def ingest(self, files, copy=True):
+        futures = [self.submit(path, kind, copy) for kind, path in files]
+        return [future.result() for future in futures]
+
+    def close(self, wait=False):
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+            self.pool = None
+
+
+# Function to open a file with the desktop's default application
+def open_with_default_app(path):
+    if sys.platform == 'win32':
+        os.startfile(path)
+    elif sys.platform == 'darwin':
+        subprocess.Popen(['open', path])
+    else:
+        subprocess.Popen(['xdg-open', path])
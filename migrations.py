@@ -0,0 +1,150 @@
+import sqlite3
+import sys
+
+from media import add_rendition_columns, create_media_table, index_bulk_media
+from search_index import create_search_index
+
+# Versioned schema migrations for housing_extended.db.
+#
+# The schema version is stored in PRAGMA user_version. Each migration below
+# brings the database from version N-1 to N and runs in its own transaction, so
+# existing databases are upgraded in place at startup instead of being dropped
+# and recreated. To change the schema, append a new function to MIGRATIONS;
+# never edit one that has already shipped.
+
+
+def _create_base_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS apartments
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, address TEXT, price REAL, description TEXT, images TEXT, video TEXT, user_role TEXT, user_id TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS users
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT, password TEXT, role TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS actions
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, action TEXT, timestamp TEXT)''')
+
+
+def _create_search_index(conn):
+    create_search_index(conn)
+
+
+def _create_secondary_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_apartments_price ON apartments (price)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_apartments_user_role ON apartments (user_role)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_apartments_user_id ON apartments (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_actions_timestamp ON actions (timestamp)")
+
+
+def _create_actions_archive(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS actions_archive
+                    (id INTEGER PRIMARY KEY, action TEXT, timestamp TEXT)''')
+
+
+# Move the comma-joined images/video paths into apartment_media. Files are
+# hashed and rendered afterwards in the background (media.ingest_pending_media).
+def _create_media_table(conn):
+    create_media_table(conn)
+    index_bulk_media(conn, 0)
+
+
+# Index for sorting by address; price, user_role and user_id already have one,
+# and their entries end with the rowid, so (column, id) order is the index order.
+# description, images and video are long text that nobody sorts a large table
+# by often enough to be worth the space; they are sorted with a top-N sort.
+def _create_sort_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_apartments_address ON apartments (address)")
+
+
+# Rendition paths and video duration of files ingested by media_store
+def _add_media_renditions(conn):
+    add_rendition_columns(conn)
+
+
+MIGRATIONS = [
+    _create_base_tables,
+    _create_search_index,
+    _create_secondary_indexes,
+    _create_actions_archive,
+    _create_media_table,
+    _create_sort_indexes,
+    _add_media_renditions,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# Function to apply all pending migrations; returns the list of versions applied
+def migrate(conn):
+    applied = []
+    version = get_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this application ({SCHEMA_VERSION}).")
+    if conn.in_transaction:
+        conn.commit()
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            conn.execute("BEGIN")
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(target)
+    return applied
+
+
+# Queries the app issues and the index each one is expected to use
+QUERY_PLAN_CHECKS = [
+    ("load_data (keyset page)", "SELECT * FROM apartments WHERE id > ? ORDER BY id LIMIT ?", (0, 10), "INTEGER PRIMARY KEY"),
+    ("load_filtered_data", "SELECT * FROM apartments WHERE user_role = ?", ("Student",), "idx_apartments_user_role"),
+    ("load_by_price_range", "SELECT * FROM apartments WHERE price BETWEEN ? AND ?", (0, 1000), "idx_apartments_price"),
+    ("advanced_search (LIKE fallback)",
+     "SELECT * FROM apartments WHERE (address LIKE ? OR description LIKE ?) AND price BETWEEN ? AND ?",
+     ('%a%', '%a%', 0, 1000), "idx_apartments_price"),
+    ("sorted page (price, descending)",
+     "SELECT * FROM (SELECT * FROM apartments WHERE (price, id) < (?, ?) ORDER BY price DESC, id DESC LIMIT ?) UNION ALL "
+     "SELECT * FROM (SELECT * FROM apartments WHERE price IS NULL ORDER BY price DESC, id DESC LIMIT ?) LIMIT ?",
+     (1000, 1, 10, 10, 10), "idx_apartments_price"),
+    ("sorted page after a NULL (address)",
+     "SELECT * FROM (SELECT * FROM apartments WHERE address IS NULL AND id > ? ORDER BY address, id LIMIT ?) UNION ALL "
+     "SELECT * FROM (SELECT * FROM apartments WHERE address IS NOT NULL ORDER BY address, id LIMIT ?) LIMIT ?",
+     (0, 10, 10, 10), "idx_apartments_address"),
+    ("sorted page (address)", "SELECT * FROM apartments WHERE (address, id) > (?, ?) ORDER BY address, id LIMIT ?",
+     ('', 0, 10), "idx_apartments_address"),
+    ("filtered sorted page (role, by price)",
+     "SELECT * FROM apartments WHERE user_role = ? AND (price, id) > (?, ?) ORDER BY price, id LIMIT ?",
+     ("Student", 0, 0, 10), "idx_apartments_"),
+    ("price snapshot load", "SELECT price, id, user_role FROM apartments WHERE price IS NOT NULL ORDER BY price, id",
+     (), "idx_apartments_price"),
+    ("price snapshot page", "SELECT * FROM apartments WHERE id IN (?, ?, ?)", (1, 2, 3), "INTEGER PRIMARY KEY"),
+    ("show_recent_actions", "SELECT * FROM actions ORDER BY timestamp DESC LIMIT 100", (), "idx_actions_timestamp"),
+    ("fill_media_metadata (pending renditions)", "SELECT id, kind, path FROM apartment_media WHERE thumb_path IS NULL LIMIT ?",
+     (50,), "idx_apartment_media_pending"),
+    ("view_details (media)", "SELECT path FROM apartment_media WHERE apartment_id = ? AND kind = ? ORDER BY position",
+     (1, 'image'), "idx_apartment_media_apartment"),
+]
+
+
+# Function to check with EXPLAIN QUERY PLAN that every query uses its index.
+# Returns a list of (name, ok, plan) tuples.
+def check_query_plans(conn):
+    results = []
+    for name, query, params, expected in QUERY_PLAN_CHECKS:
+        plan = " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+        results.append((name, expected in plan, plan))
+    return results
+
+
+if __name__ == "__main__":
+    database = sys.argv[1] if len(sys.argv) > 1 else 'housing_extended.db'
+    connection = sqlite3.connect(database)
+    print(f"Applied migrations: {migrate(connection) or 'none'} (schema version {get_version(connection)})")
+    failed = False
+    for name, ok, plan in check_query_plans(connection):
+        print(f"{'OK  ' if ok else 'FAIL'} {name}: {plan}")
+        failed = failed or not ok
+    connection.close()
+    sys.exit(1 if failed else 0)
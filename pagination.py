@@ -0,0 +1,241 @@
+import threading
+
+
+# SQLite's order of values of different types: NULL, numbers, text, blobs
+def _sql_order(value):
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, bytes(value))
+
+
+# Function to compile the conditions for the rows after key in (column, id)
+# order, for key_columns ('id',) or (column, 'id'). SQLite sorts NULL before
+# every value and a row-value comparison with NULL is never true, so a
+# nullable column takes two runs: after a NULL key the remaining NULL rows and
+# then every other row, or in descending order the rows after a key with a
+# value and then the NULL rows. Returns [(condition, params)] in page order.
+def seek_conditions(key_columns, key, descending=False, prefix=''):
+    operator = '<' if descending else '>'
+    if len(key_columns) == 1:
+        return [(f"{prefix}id {operator} ?", (key[0],))]
+    column = prefix + key_columns[0]
+    value, row_id = key
+    if value is None:
+        nulls = (f"{column} IS NULL AND {prefix}id {operator} ?", (row_id,))
+        return [nulls] if descending else [nulls, (f"{column} IS NOT NULL", ())]
+    after = (f"({column}, {prefix}id) {operator} (?, ?)", (value, row_id))
+    return [after, (f"{column} IS NULL", ())] if descending else [after]
+
+
+# Function to compile "select WHERE where AND condition ORDER BY order_by
+# LIMIT limit OFFSET offset" for the conditions of seek_conditions; two runs
+# are read one after the other with UNION ALL, each an index seek limited to
+# the rows the page can use. where may be ''. Returns (query, params).
+def seek_query(select, where, params, conditions, order_by, limit, offset=0):
+    parts, values = [], []
+    for condition, condition_params in conditions:
+        parts.append(f"{select} WHERE {where + ' AND ' if where else ''}{condition} ORDER BY {order_by}")
+        values.append(tuple(params) + tuple(condition_params))
+    tail, tail_params = (" LIMIT ? OFFSET ?", (limit, offset)) if offset else (" LIMIT ?", (limit,))
+    if len(parts) == 1:
+        return parts[0] + tail, values[0] + tail_params
+    query = " UNION ALL ".join(f"SELECT * FROM ({part} LIMIT ?)" for part in parts) + tail
+    return query, sum((part_params + (limit + offset,) for part_params in values), ()) + tail_params
+
+
+# Keyset (seek) pagination over a single table.
+#
+# Instead of LIMIT/OFFSET, every page is fetched with
+#   WHERE (sort_key, id) > (anchor) ORDER BY sort_key, id LIMIT page_size
+# where the anchor is the last key of the previous page (< and DESC when the
+# order is descending; see seek_conditions for NULL sort values). Anchors are remembered as pages are visited, so
+# Previous/Next and reloading the current page all cost the same no matter how
+# deep the page is. The total row count is cached and adjusted by the mutation
+# handlers instead of running COUNT(*) on every flip. set_filter() restricts the
+# pages to the rows matching a WHERE clause, e.g. ListingQuery.where(alias='').
+#
+# The pages are read on one thread (the DB worker's reader lane) while the
+# mutation handlers call note_*() and reset() from another. The cached total
+# and anchors are only touched under lock, and the queries run outside it: a
+# count or anchor read while a note_*() call invalidated the cache is returned
+# but not kept. The filter and sort key belong to the reading thread.
+class KeysetPaginator:
+    def __init__(self, conn, table='apartments', page_size=10, sort_key='id', descending=False):
+        self.conn = conn
+        self.table = table
+        self.page_size = page_size
+        self.sort_key = sort_key
+        self.descending = descending
+        self.where = ''
+        self.params = ()
+        self.total = None
+        self.anchors = {0: None}
+        self.lock = threading.Lock()
+        # Bumped whenever the cached total or anchors are invalidated
+        self.generation = 0
+
+    # Columns that make up the seek key, always ending with the unique id
+    def _key_columns(self):
+        if self.sort_key == 'id':
+            return ('id',)
+        return (self.sort_key, 'id')
+
+    def _key_of(self, row):
+        names = [d[0] for d in self._description]
+        return tuple(row[names.index(col)] for col in self._key_columns())
+
+    def _order_by(self):
+        direction = ' DESC' if self.descending else ''
+        return ', '.join(col + direction for col in self._key_columns())
+
+    # Function to compile the query for the rows after an anchor
+    def _seek_query(self, select, anchor, limit, offset=0):
+        return seek_query(select, self.where, self.params, seek_conditions(self._key_columns(), anchor, self.descending),
+                          self._order_by(), limit, offset)
+
+    # The filter alone, for the first page
+    def _where_clause(self):
+        return f" WHERE {self.where}" if self.where else ""
+
+    # Function to change the active sort key or direction; all anchors become invalid
+    def set_sort_key(self, sort_key, descending=False):
+        if sort_key != self.sort_key or descending != self.descending:
+            self.sort_key = sort_key
+            self.descending = descending
+            with self.lock:
+                self.anchors = {0: None}
+                self.generation += 1
+
+    # Function to change the filter (a WHERE clause without the keyword, '' for
+    # none); the total is counted again and all anchors become invalid
+    def set_filter(self, where='', params=()):
+        if where != self.where or tuple(params) != self.params:
+            self.where = where
+            self.params = tuple(params)
+            self.reset()
+
+    # Function to page through the rows matching a ListingQuery, in its order
+    def set_query(self, listing_query, use_fts=True):
+        self.set_filter(*listing_query.where(use_fts, alias=''))
+        self.set_sort_key(listing_query.sort or 'id', listing_query.descending)
+
+    # Cached total number of rows, counted only once
+    def count(self):
+        with self.lock:
+            if self.total is not None:
+                return self.total
+            generation = self.generation
+        total = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}{self._where_clause()}", self.params).fetchone()[0]
+        with self.lock:
+            if generation == self.generation:
+                self.total = total
+        return total
+
+    def total_pages(self):
+        return max(1, (self.count() + self.page_size - 1) // self.page_size)
+
+    def clamp(self, page):
+        return max(0, min(page, self.total_pages() - 1))
+
+    # Find the anchor for a page we have not visited yet by stepping forward
+    # from the closest known anchor. Only the gap between the two pages is
+    # walked, and only once. Returns None past the last row.
+    def _find_anchor(self, anchors, page):
+        known = max(p for p in anchors if p <= page)
+        anchor = anchors[known]
+        skip = (page - known) * self.page_size - 1
+        cols = ', '.join(self._key_columns())
+        if anchor is None:
+            query = f"SELECT {cols} FROM {self.table}{self._where_clause()} ORDER BY {self._order_by()} LIMIT 1 OFFSET ?"
+            params = self.params + (skip,)
+        else:
+            query, params = self._seek_query(f"SELECT {cols} FROM {self.table}", anchor, 1, skip)
+        row = self.conn.execute(query, params).fetchone()
+        return None if row is None else tuple(row)
+
+    # Function to fetch one page of rows
+    def fetch_page(self, page):
+        page = self.clamp(page)
+        with self.lock:
+            anchors, generation = dict(self.anchors), self.generation
+        found = {}
+        if page not in anchors:
+            found[page] = anchors[page] = self._find_anchor(anchors, page)
+        anchor = anchors.get(page)
+        if anchor is None:
+            cursor = self.conn.execute(
+                f"SELECT * FROM {self.table}{self._where_clause()} ORDER BY {self._order_by()} LIMIT ?",
+                self.params + (self.page_size,))
+        else:
+            cursor = self.conn.execute(*self._seek_query(f"SELECT * FROM {self.table}", anchor, self.page_size))
+        self._description = cursor.description
+        rows = cursor.fetchall()
+        if len(rows) == self.page_size:
+            found[page + 1] = self._key_of(rows[-1])
+        with self.lock:
+            if generation == self.generation:
+                self.anchors.update((p, a) for p, a in found.items() if a is not None)
+        return page, rows
+
+    # Whether a key comes before another in page order
+    def _before(self, key, other):
+        key, other = tuple(map(_sql_order, key)), tuple(map(_sql_order, other))
+        return key > other if self.descending else key < other
+
+    # Drop every anchor at or after the given key; pages before it are
+    # unaffected. Without the key's sort value every anchor is dropped. Called
+    # with the lock held.
+    def _invalidate_from(self, key):
+        self.generation += 1
+        if key is None:
+            self.anchors = {0: None}
+            return
+        key = tuple(key)
+        self.anchors = {p: a for p, a in self.anchors.items() if a is None or self._before(a, key)}
+
+    def _key_tuple(self, row_id, sort_value):
+        if self.sort_key == 'id':
+            return (row_id,)
+        if sort_value is None:
+            return None
+        return (sort_value, row_id)
+
+    # Functions called by the mutation handlers to keep the cache in sync. With
+    # a filter the changed row may not be part of the pages, so the total is
+    # counted again.
+    def note_insert(self, row_id, sort_value=None):
+        with self.lock:
+            if self.where:
+                self.total = None
+            elif self.total is not None:
+                self.total += 1
+            self._invalidate_from(self._key_tuple(row_id, sort_value))
+
+    def note_delete(self, row_id, sort_value=None):
+        with self.lock:
+            if self.where:
+                self.total = None
+            elif self.total is not None:
+                self.total = max(0, self.total - 1)
+            self._invalidate_from(self._key_tuple(row_id, sort_value))
+
+    def note_update(self, row_id, old_sort_value=None, new_sort_value=None):
+        with self.lock:
+            if self.where:
+                self.total = None
+                self._invalidate_from(None)
+                return
+            if self.sort_key == 'id' or old_sort_value == new_sort_value:
+                return
+            self.generation += 1
+            first = (max if self.descending else min)(old_sort_value, new_sort_value, key=_sql_order)
+            self.anchors = {p: a for p, a in self.anchors.items() if a is None or self._before(a[:1], (first,))}
+
+    def reset(self, total=None):
+        with self.lock:
+            self.total = total
+            self._invalidate_from(None)
@@ -0,0 +1,351 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress
+
+# Optional in-memory columnar snapshot of the listings' prices.
+#
+# Three parallel typed arrays hold every listing with a price, sorted by
+# (price, id): the prices as doubles, the ids as 64-bit integers and the user
+# role as a one-byte code interned in role_names. That is 17 bytes per listing,
+# about 17 MB for a million listings, where the same listings as tuple rows
+# take several hundred MB. A price range is two binary searches, and its ids
+# are one slice of the id array; a role filter narrows that slice by comparing
+# codes, without creating a row. Only the page of listings being shown is then
+# read from SQLite, by id (see SnapshotPaginator). The analytics statistics are
+# computed from the same arrays: the histogram with one binary search per bin.
+#
+# The snapshot is loaded once with load() and kept current with apply(), which
+# takes the ListingRepository's 'insert' and 'reset' events; after a 'reset' it
+# is empty until loaded again. The events carry only the new row, so updates
+# and deletes are applied by the mutation handlers with update() and remove()
+# and the old price, which finds the listing with a binary search. Rows without
+# a price are left out, as a price condition never matches them. All methods
+# may be called from any thread.
+ROLE_CODE_LIMIT = 256
+
+
+# Function to return, for each role code, whether it is the given code; with
+# one-byte codes this is a bytes.translate, so no Python call per listing
+def _role_mask(roles, code):
+    if roles.typecode == 'B':
+        table = bytearray(ROLE_CODE_LIMIT)
+        table[code] = 1
+        return roles.tobytes().translate(table)
+    return map(code.__eq__, roles)
+
+
+class PriceSnapshot:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.prices = array('d')
+        self.ids = array('q')
+        self.roles = array('B')
+        self.role_names = []
+        self.role_codes = {}
+        self.ready = False
+        # Changes that arrive while load() runs, applied once it is done
+        self.pending = None
+        # Bumped on every change, so selections made from the arrays know
+        # when they are stale
+        self.version = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _code(self, role):
+        code = self.role_codes.get(role)
+        if code is None:
+            code = self.role_codes[role] = len(self.role_names)
+            self.role_names.append(role)
+            if code == ROLE_CODE_LIMIT and self.roles.typecode == 'B':
+                self.roles = array('H', self.roles)
+        return code
+
+    # Function to (re)load the snapshot from a connection, in chunks; returns
+    # the number of listings. Changes applied meanwhile are replayed on top.
+    def load(self, conn, chunk_size=20000):
+        with self.lock:
+            self.pending = []
+        fresh = PriceSnapshot()
+        cursor = conn.execute("SELECT price, id, user_role FROM apartments WHERE price IS NOT NULL ORDER BY price, id")
+        for chunk in iter(lambda: cursor.fetchmany(chunk_size), []):
+            chunk_prices, chunk_ids, chunk_roles = zip(*chunk)
+            fresh.prices.extend(chunk_prices)
+            fresh.ids.extend(chunk_ids)
+            codes = [fresh._code(role) for role in chunk_roles]
+            fresh.roles.extend(codes)
+        with self.lock:
+            self.prices, self.ids, self.roles = fresh.prices, fresh.ids, fresh.roles
+            self.role_names, self.role_codes = fresh.role_names, fresh.role_codes
+            self.ready = True
+            self.version += 1
+            pending, self.pending = self.pending, None
+            for change, args in pending:
+                change(*args)
+        return len(self.ids)
+
+    def clear(self):
+        with self.lock:
+            self.prices, self.ids, self.roles = array('d'), array('q'), array('B')
+            self.role_names, self.role_codes = [], {}
+            self.ready = False
+            self.version += 1
+
+    # Function to make a change now, or once load() is done if it is running;
+    # before the first load there is nothing to change
+    def _change(self, change, *args):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((change, args))
+            elif self.ready:
+                change(*args)
+
+    # Function to find the position of a listing, with a binary search for
+    # each price it may have; None if it has none of them
+    def _position(self, listing_id, *prices):
+        for price in prices:
+            if price is None:
+                continue
+            low = bisect_left(self.prices, price)
+            high = bisect_right(self.prices, price, low)
+            position = bisect_left(self.ids, listing_id, low, high)
+            if position < high and self.ids[position] == listing_id:
+                return position
+        return None
+
+    def _insert(self, listing_id, price, user_role):
+        if price is None or self._position(listing_id, price) is not None:
+            return
+        low = bisect_left(self.prices, price)
+        position = bisect_left(self.ids, listing_id, low, bisect_right(self.prices, price, low))
+        self.prices.insert(position, price)
+        self.ids.insert(position, listing_id)
+        self.roles.insert(position, self._code(user_role))
+        self.version += 1
+
+    def _remove(self, listing_id, *prices):
+        position = self._position(listing_id, *prices)
+        if position is not None:
+            del self.prices[position]
+            del self.ids[position]
+            del self.roles[position]
+            self.version += 1
+
+    # A listing load() already saw is not inserted twice
+    def insert(self, listing_id, price, user_role):
+        self._change(self._insert, listing_id, price, user_role)
+
+    # Function to remove a listing with the given price
+    def remove(self, listing_id, price):
+        self._change(self._remove, listing_id, price)
+
+    # Function to apply a changed listing; old_price is its price before the
+    # change. A listing load() read after the change is found at its new price.
+    def update(self, listing_id, old_price, price, user_role):
+        self._change(self._update, listing_id, old_price, price, user_role)
+
+    def _update(self, listing_id, old_price, price, user_role):
+        self._remove(listing_id, old_price, price)
+        self._insert(listing_id, price, user_role)
+
+    # Function to apply a ListingRepository event; updates and deletes come
+    # through update() and remove(), with the old price
+    def apply(self, event, payload):
+        if event == 'reset':
+            self._change(self.clear)
+        elif event == 'insert':
+            self.insert(payload.id, payload.price, payload.user_role)
+
+    # Whether a ListingQuery is answered by select(): no other criteria than a
+    # price range and a role, in price or id order. A role filter alone stays
+    # in SQL, as it also matches the listings without a price, which the
+    # snapshot leaves out.
+    def serves(self, query):
+        return (self.ready and not query.text and query.user_id is None and query.has_images is None
+                and query.has_video is None and (query.min_price is not None or query.max_price is not None)
+                and query.sort in (None, 'id', 'price'))
+
+    # The positions of the listings with min_price <= price <= max_price
+    def _range(self, min_price, max_price):
+        low = 0 if min_price is None else bisect_left(self.prices, min_price)
+        high = len(self.prices) if max_price is None else bisect_right(self.prices, max_price)
+        return low, max(low, high)
+
+    # Function to return the ids of the listings with min_price <= price <=
+    # max_price (None for an open bound) and the given role, as an array in
+    # (price, id) order, or in id order with by_id
+    def select(self, min_price=None, max_price=None, user_role=None, by_id=False):
+        with self.lock:
+            low, high = self._range(min_price, max_price)
+            ids = self.ids[low:high]
+            if user_role is not None:
+                code = self.role_codes.get(user_role)
+                if code is None:
+                    return array('q')
+                ids = array('q', compress(ids, _role_mask(self.roles[low:high], code)))
+        return array('q', sorted(ids)) if by_id else ids
+
+    # Function to count the ids select() returns without building them: two
+    # binary searches, and with a role a byte count over the role codes
+    def count(self, min_price=None, max_price=None, user_role=None):
+        with self.lock:
+            low, high = self._range(min_price, max_price)
+            if user_role is None:
+                return high - low
+            code = self.role_codes.get(user_role)
+            if code is None:
+                return 0
+            roles = self.roles[low:high]
+        return roles.tobytes().count(code) if roles.typecode == 'B' else roles.count(code)
+
+    # Function to compute analytics.compute_stats() from the arrays; None
+    # until the snapshot is loaded
+    def stats(self, bins=20):
+        with self.lock:
+            if not self.ready:
+                return None
+            prices, roles, role_names = self.prices[:], self.roles[:], list(self.role_names)
+        by_role = []
+        for code, role in enumerate(role_names):
+            selected = array('d', compress(prices, _role_mask(roles, code)))
+            if selected:
+                by_role.append((role or '', len(selected), sum(selected) / len(selected), selected[0], selected[-1]))
+        by_role.sort(key=lambda row: row[1], reverse=True)
+        if not prices:
+            return {"roles": by_role, "histogram": [], "bin_width": 0}
+        low, high = prices[0], prices[-1]
+        width = (high - low) / bins or 1.0
+
+        # Bucket as the SQL does; the bucket number only grows with the price
+        def bucket(price):
+            return min(int((price - low) / width), bins - 1)
+
+        starts = [bisect_left(prices, i, key=bucket) for i in range(bins)] + [len(prices)]
+        histogram = [(low + i * width, starts[i + 1] - starts[i]) for i in range(bins)]
+        return {"roles": by_role, "histogram": histogram, "bin_width": width}
+
+    # Function to report the memory the arrays take, in bytes
+    def memory_usage(self):
+        with self.lock:
+            arrays = {"prices": self.prices, "ids": self.ids, "roles": self.roles}
+            usage = {name: sys.getsizeof(values) for name, values in arrays.items()}
+            usage["role_names"] = sys.getsizeof(self.role_names) + sum(sys.getsizeof(role) for role in self.role_names)
+        usage["total"] = sum(usage.values())
+        return usage
+
+
+# Pages through price-range queries from a PriceSnapshot, with the interface
+# of KeysetPaginator. The ids of the whole selection are kept (8 bytes each)
+# and a page is a slice of them; its rows are read with one lookup by id.
+# Every other query goes to the given KeysetPaginator.
+#
+# The selection and the count are made for a snapshot version and made again
+# once it changed. Both are computed on the reading thread (the DB worker's
+# reader lane) outside the lock; the mutation handlers only read total, which
+# is None while the count is stale, so they never select or count themselves.
+class SnapshotPaginator:
+    def __init__(self, paginator, snapshot):
+        self.paginator = paginator
+        self.snapshot = snapshot
+        self.conn = paginator.conn
+        self.page_size = paginator.page_size
+        self.lock = threading.Lock()
+        self.query = None
+        # (snapshot version, ids) and (snapshot version, number of ids)
+        self.selection = None
+        self.counted = None
+
+    @property
+    def sort_key(self):
+        with self.lock:
+            query = self.query
+        return (query.sort or 'id') if query is not None else self.paginator.sort_key
+
+    @property
+    def total(self):
+        with self.lock:
+            query, counted = self.query, self.counted
+        if query is None:
+            return self.paginator.total
+        return counted[1] if counted is not None and counted[0] == self.snapshot.version else None
+
+    # The same query object is shown again when flipping pages, and keeps its
+    # selection
+    def set_query(self, listing_query, use_fts=True):
+        serves = self.snapshot.serves(listing_query)
+        with self.lock:
+            if serves and listing_query is self.query:
+                return
+            self.query = listing_query if serves else None
+            self.selection = self.counted = None
+        if not serves:
+            self.paginator.set_query(listing_query, use_fts)
+
+    # Function to return (query, value) for the current query, from the cache
+    # in the given attribute while the snapshot version is unchanged, or else
+    # computed with make(query) and cached
+    def _cached(self, name, make):
+        with self.lock:
+            query, cached = self.query, getattr(self, name)
+        version = self.snapshot.version
+        if cached is not None and cached[0] == version:
+            return query, cached[1]
+        value = make(query)
+        with self.lock:
+            if self.query is query:
+                setattr(self, name, (version, value))
+        return query, value
+
+    def _selection(self):
+        return self._cached('selection', lambda query: self.snapshot.select(
+            query.min_price, query.max_price, query.user_role, by_id=query.sort != 'price'))
+
+    def count(self):
+        with self.lock:
+            query = self.query
+        if query is None:
+            return self.paginator.count()
+        return self._cached('counted', lambda query: self.snapshot.count(
+            query.min_price, query.max_price, query.user_role))[1]
+
+    def total_pages(self):
+        return max(1, (self.count() + self.page_size - 1) // self.page_size)
+
+    def clamp(self, page):
+        return max(0, min(page, self.total_pages() - 1))
+
+    def fetch_page(self, page):
+        with self.lock:
+            query = self.query
+        if query is None:
+            return self.paginator.fetch_page(page)
+        page = self.clamp(page)
+        query, selection = self._selection()
+        start = page * self.page_size
+        if query.descending:
+            ids = selection[max(0, len(selection) - start - self.page_size):len(selection) - start][::-1].tolist()
+        else:
+            ids = selection[start:start + self.page_size].tolist()
+        if not ids:
+            return page, []
+        placeholders = ', '.join('?' for _ in ids)
+        rows = {row[0]: row for row in self.conn.execute(f"SELECT * FROM apartments WHERE id IN ({placeholders})", ids)}
+        return page, [rows[listing_id] for listing_id in ids if listing_id in rows]
+
+    # The mutation handlers' calls; the selection is refreshed from the
+    # snapshot's version instead
+    def note_insert(self, row_id, sort_value=None):
+        self.paginator.note_insert(row_id, sort_value)
+
+    def note_delete(self, row_id, sort_value=None):
+        self.paginator.note_delete(row_id, sort_value)
+
+    def note_update(self, row_id, old_sort_value=None, new_sort_value=None):
+        self.paginator.note_update(row_id, old_sort_value, new_sort_value)
+
+    def reset(self, total=None):
+        with self.lock:
+            self.selection = self.counted = None
+        self.paginator.reset(total)
@@ -0,0 +1,160 @@
+import string
+import unicodedata
+from collections import OrderedDict
+
+from listing_repository import FIELDS
+from search_index import SEARCH_COLUMNS, TOKEN_RE
+
+# Cache of search results for search-as-you-type.
+#
+# Complete result sets are kept in a bounded LRU keyed by the ListingQuery's
+# normalized text, text columns and other criteria; a page of results is a
+# slice of its entry. When the user refines a search (appends characters or
+# words), the new result is a subset of a cached broader one, so it is
+# computed by filtering that result in memory with the same matching rules as
+# the query (FTS5 prefix terms or LIKE substrings) instead of running the
+# query again. Filtered results keep the order of the broader result. Refining tests one prepared text per row (see
+# texts()), which costs far less than the query; the texts are best computed
+# on the DB worker while the rows are fetched and passed to put(). Entries
+# stored without them are only refined if they are small.
+#
+# Any mutation must call invalidate(); results fetched before it are refused by
+# put() because they carry the older generation.
+_COLUMN_INDEX = {name: FIELDS.index(name) for name in FIELDS}
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_ASCII_SEPARATORS = str.maketrans({chr(c): ' ' for c in range(128) if not TOKEN_RE.match(chr(c))})
+
+
+# Lower case without diacritics, as FTS5's unicode61 tokenizer folds text
+def _fold(text):
+    text = str(text).lower()
+    if text.isascii():
+        return text
+    return ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch))
+
+
+def _tokens(term):
+    return TOKEN_RE.findall(_fold(term))
+
+
+# Folded text with a space before every token (tokens are separated by at
+# least one space), so a prefix test is a plain substring search
+def _token_text(text):
+    text = _fold(text)
+    if text.isascii():
+        return " " + text.translate(_ASCII_SEPARATORS)
+    return " " + " ".join(TOKEN_RE.findall(text))
+
+
+# LIKE is only case-insensitive for ASCII letters
+def _like_fold(text):
+    return str(text).translate(_ASCII_LOWER)
+
+
+class SearchCache:
+    def __init__(self, use_fts=True, max_entries=32, max_rows=200000, max_result_rows=100000, max_refine_rows=20000):
+        self.use_fts = use_fts
+        self.max_refine_rows = max_refine_rows
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.max_result_rows = max_result_rows
+        self.entries = OrderedDict()
+        self.rows = 0
+        self.generation = 0
+        self.hits = 0
+        self.refined = 0
+        self.misses = 0
+
+    # Function to build the cache key of a ListingQuery; queries differing only
+    # in their text share everything after the first two items
+    def key(self, query):
+        term = " ".join(_tokens(query.text)) if self.use_fts else _like_fold(query.text)
+        return (term, query.text_columns, query.user_role, query.min_price, query.max_price, query.user_id,
+                query.has_images, query.has_video, query.sort, query.descending)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    # Function to store a complete result fetched while generation was current.
+    # texts are the rows' folded texts, if already known.
+    def put(self, key, rows, generation, texts=None):
+        if generation != self.generation or len(rows) > self.max_result_rows:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.rows -= len(old[0])
+        self.entries[key] = (tuple(rows), texts)
+        self.rows += len(rows)
+        while len(self.entries) > self.max_entries or self.rows > self.max_rows:
+            _, (evicted, _) = self.entries.popitem(last=False)
+            self.rows -= len(evicted)
+
+    def invalidate(self):
+        self.entries.clear()
+        self.rows = 0
+        self.generation += 1
+
+    # Whether every row matching new_term also matches base_term
+    def _narrows(self, base_term, new_term):
+        if not base_term:
+            return False
+        if not self.use_fts:
+            # % and _ are LIKE wildcards, which plain substring tests cannot follow
+            return base_term in new_term and not any(ch in new_term for ch in '%_\n')
+        new_tokens = new_term.split()
+        return all(any(new.startswith(base) for new in new_tokens) for base in base_term.split())
+
+    # Function to compute the searchable text of rows: for LIKE the searched
+    # columns one per line, for FTS their folded tokens, each preceded by a space
+    def texts(self, rows, columns=SEARCH_COLUMNS):
+        indexes = [_COLUMN_INDEX[col] for col in columns]
+        if not self.use_fts:
+            return ["\n".join(_like_fold(row[i]) for i in indexes if row[i] is not None) for row in rows]
+        return [_token_text("\n".join(str(row[i]) for i in indexes if row[i] is not None)) for row in rows]
+
+    def _matcher(self, term):
+        if not self.use_fts:
+            return lambda text: term in text
+        # A query token matches a row token it is a prefix of
+        needles = [" " + token for token in term.split()]
+        return lambda text: all(needle in text for needle in needles)
+
+    # Function to compute a result by filtering the narrowest cached result it
+    # refines; returns None if there is none
+    def refine(self, key):
+        term, columns = key[0], key[1]
+        base = None
+        for cached_key in self.entries:
+            cached_rows, cached_texts = self.entries[cached_key]
+            if cached_texts is None and len(cached_rows) > self.max_refine_rows:
+                continue
+            if (cached_key[1:] == key[1:] and self._narrows(cached_key[0], term)
+                    and (base is None or len(self.entries[cached_key][0]) < len(self.entries[base][0]))):
+                base = cached_key
+        if base is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(base)
+        base_rows, base_texts = self.entries[base]
+        if base_texts is None:
+            base_texts = self.texts(base_rows, columns)
+            self.entries[base] = (base_rows, base_texts)
+        matches = self._matcher(term)
+        selected = [index for index, text in enumerate(base_texts) if matches(text)]
+        rows = [base_rows[index] for index in selected]
+        self.put(key, rows, self.generation, [base_texts[index] for index in selected])
+        self.refined += 1
+        return rows
+
+    def lookup(self, key):
+        rows = self.get(key)
+        return rows if rows is not None else self.refine(key)
+
+    @staticmethod
+    def page(rows, page, page_size):
+        return rows[page * page_size:(page + 1) * page_size]
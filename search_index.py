@@ -0,0 +1,91 @@
+import re
+import sqlite3
+
+# Full-text search over the apartments table.
+#
+# apartments_fts is an external-content FTS5 table: it stores only the index,
+# the row data stays in apartments. Triggers keep it in sync on every insert,
+# update and delete, so the handlers do not need to know it exists.
+SEARCH_COLUMNS = ("address", "price", "description", "images", "video", "user_role")
+
+# Words as FTS5's unicode61 tokenizer splits them: runs of letters and
+# digits; the underscore separates words like any other punctuation. The
+# search cache refines results with the same pattern.
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def _column_list(prefix=""):
+    return ", ".join(prefix + col for col in SEARCH_COLUMNS)
+
+
+def _create_triggers(conn):
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS apartments_fts_ai AFTER INSERT ON apartments BEGIN
+                         INSERT INTO apartments_fts (rowid, {_column_list()}) VALUES (new.id, {_column_list("new.")});
+                     END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS apartments_fts_ad AFTER DELETE ON apartments BEGIN
+                         INSERT INTO apartments_fts (apartments_fts, rowid, {_column_list()}) VALUES ('delete', old.id, {_column_list("old.")});
+                     END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS apartments_fts_au AFTER UPDATE ON apartments BEGIN
+                         INSERT INTO apartments_fts (apartments_fts, rowid, {_column_list()}) VALUES ('delete', old.id, {_column_list("old.")});
+                         INSERT INTO apartments_fts (rowid, {_column_list()}) VALUES (new.id, {_column_list("new.")});
+                     END''')
+
+
+# Functions for bulk loads: inside one transaction, drop the per-row insert
+# trigger, insert the rows, then index them with a single INSERT ... SELECT and
+# put the trigger back. This is several times faster than firing the trigger
+# for every row, and atomic with the insert.
+def suspend_insert_trigger(conn):
+    if not search_index_exists(conn):
+        return False
+    conn.execute("DROP TRIGGER IF EXISTS apartments_fts_ai")
+    return True
+
+
+def index_rows_after(conn, last_id):
+    conn.execute(f"INSERT INTO apartments_fts (rowid, {_column_list()}) SELECT id, {_column_list()} FROM apartments WHERE id > ?",
+                 (last_id,))
+    _create_triggers(conn)
+
+
+# Function to create the index and its triggers without committing. Databases
+# created before the index existed are backfilled once, the first time this runs
+# against them. Returns False if this SQLite build has no FTS5, in which case
+# text criteria are compiled to LIKE scans (see listing_query).
+def create_search_index(conn):
+    if search_index_exists(conn):
+        return True
+    try:
+        conn.execute(f'''CREATE VIRTUAL TABLE apartments_fts USING fts5
+                         ({_column_list()}, content='apartments', content_rowid='id', prefix='2 3')''')
+    except sqlite3.OperationalError:
+        return False
+    _create_triggers(conn)
+    conn.execute("INSERT INTO apartments_fts (apartments_fts) VALUES ('rebuild')")
+    return True
+
+
+def search_index_exists(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='apartments_fts'").fetchone() is not None
+
+
+# Function to turn user input into an FTS5 query: every word becomes a quoted
+# prefix term and all terms must match. Returns None if there is nothing to match.
+def build_match_query(term, columns=None):
+    tokens = TOKEN_RE.findall(term)
+    if not tokens:
+        return None
+    query = " ".join('"' + token.replace('"', '""') + '"*' for token in tokens)
+    if columns:
+        query = "{" + " ".join(columns) + "} : (" + query + ")"
+    return query
+
+
+# Function to build the search query and its parameters without running it,
+# e.g. to stream the result of the current search into an export. user_role
+# optionally restricts the result to one role. The query is compiled by
+# listing_query, which builds on this module and is imported here late.
+def search_query(term, min_price=None, max_price=None, columns=SEARCH_COLUMNS, use_fts=True, user_role=None):
+    from listing_query import ListingQuery
+    return ListingQuery(term, user_role, min_price, max_price, text_columns=columns).compile(use_fts)
+
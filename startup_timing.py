@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+
+# Startup timing report, in the spirit of `python -X importtime`.
+#
+# housing_app.py records a mark after each startup step; once the first page
+# of listings is on screen the steps are printed to stderr with their own and
+# cumulative time. Enabled with HOUSING_STARTUP_TIMING=1 or --startup-timing.
+enabled = bool(os.environ.get("HOUSING_STARTUP_TIMING")) or "--startup-timing" in sys.argv
+
+_start = time.perf_counter()
+_marks = []
+_reported = False
+
+
+def mark(step):
+    _marks.append((step, time.perf_counter()))
+
+
+def report(file=None):
+    global _reported
+    if not enabled or _reported:
+        return
+    _reported = True
+    file = file or sys.stderr
+    print("startup: self [ms] | cumulative [ms] | step", file=file)
+    previous = _start
+    for step, moment in _marks:
+        print(f"startup: {(moment - previous) * 1000:9.1f} | {(moment - _start) * 1000:15.1f} | {step}", file=file)
+        previous = moment
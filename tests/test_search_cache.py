@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from housing_store import HousingStore, ListingInput
+from listing_query import ListingQuery
+from search_cache import SearchCache
+
+# Refined search results must be exactly what running the refined query would
+# return, including for words FTS5 splits on punctuation such as the
+# underscore in generated file names.
+LISTINGS = [
+    ("Apt 1, 12 Mill Road", "quiet flat", ["photos/2898_1.jpg"]),
+    ("Apt 2, 4 High Street", "balcony", ["photos/1_2.jpg"]),
+    ("7 Apple Lane", "near the park", ["photos/apt_1.png"]),
+    ("Appleby Court", "flat_1 with garden", []),
+    ("3 Station Road", "apt 10 above the shop", []),
+    ("Rooms_Apt 4", "student rooms", ["a_b_c.jpg"]),
+]
+
+
+class SearchCacheRefineTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = HousingStore(os.path.join(self.directory.name, "housing.db"))
+        for address, description, images in LISTINGS:
+            self.store.add_listing(ListingInput(address, 500.0, description, images))
+        if not self.store.fts_enabled:
+            self.skipTest("this SQLite build has no FTS5")
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def sql_ids(self, text):
+        return sorted(row[0] for row in self.store.query(ListingQuery(text)))
+
+    def test_refined_results_match_sql(self):
+        for broad, refined in (("Ap", "Apt 1"), ("a", "apt_1"), ("1", "1 jpg"), ("Ap", "Apt 4 rooms"), ("fl", "flat 1")):
+            with self.subTest(broad=broad, refined=refined):
+                cache = SearchCache(use_fts=True)
+                rows = list(self.store.query(ListingQuery(broad)))
+                cache.put(cache.key(ListingQuery(broad)), rows, cache.generation, cache.texts(rows))
+                result = cache.lookup(cache.key(ListingQuery(refined)))
+                self.assertEqual(cache.refined, 1)
+                self.assertEqual(sorted(row[0] for row in result), self.sql_ids(refined))
+
+
+if __name__ == "__main__":
+    unittest.main()
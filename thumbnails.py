@@ -0,0 +1,126 @@
+import hashlib
+import os
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, ImageTk
+
+# Thumbnail cache for image previews.
+#
+# Three levels: a bounded in-memory LRU of PhotoImage objects, an on-disk store
+# of small PNG thumbnails keyed by the source path, its mtime and the thumbnail
+# size, and finally decoding the original. Decoding runs on a thread pool (PIL
+# releases the GIL while decoding) and JPEGs are loaded at reduced size with
+# draft(), so a multi-megabyte photo is never fully decoded just to show 100px.
+# Results are handed to the Tk thread by polling with window.after, so callers
+# can show placeholders and have thumbnails appear as they become ready.
+class ThumbnailCache:
+    def __init__(self, window, cache_dir='thumbnail_cache', size=(100, 100), max_items=256, workers=4):
+        self.window = window
+        self.cache_dir = cache_dir
+        self.size = size
+        self.max_items = max_items
+        self.memory = OrderedDict()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self.results = queue.Queue()
+        self.waiting = {}
+        self.polling = False
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        return (os.path.abspath(path), mtime, self.size)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(f"{key[0]}|{key[1]}|{key[2][0]}x{key[2][1]}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.png')
+
+    # Runs on the pool: returns a small, fully loaded PIL image
+    def _load(self, path, key):
+        disk_path = self._disk_path(key)
+        if os.path.exists(disk_path):
+            with Image.open(disk_path) as img:
+                img.load()
+                return img.copy()
+        with Image.open(path) as img:
+            if img.format == 'JPEG':
+                img.draft('RGB', self.size)
+            img.thumbnail(self.size)
+            thumb = img.copy()
+        if thumb.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            thumb = thumb.convert('RGBA')
+        temp_path = disk_path + '.tmp'
+        thumb.save(temp_path, 'PNG')
+        os.replace(temp_path, disk_path)
+        return thumb
+
+    def _remember(self, key, photo):
+        self.memory[key] = photo
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    # Function to get the thumbnail for a path. callback(photo) runs on the Tk
+    # thread, immediately on a memory hit, otherwise once the image is decoded;
+    # photo is None if the file cannot be read.
+    def request(self, path, callback):
+        key = self._key(path)
+        if key is None:
+            callback(None)
+            return
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            callback(self.memory[key])
+            return
+        if key in self.waiting:
+            self.waiting[key].append(callback)
+            return
+        self.waiting[key] = [callback]
+        future = self.pool.submit(self._load, path, key)
+        future.add_done_callback(lambda f: self.results.put((key, f)))
+        if not self.polling:
+            self.polling = True
+            self.window.after(20, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                key, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                photo = ImageTk.PhotoImage(future.result())
+                self._remember(key, photo)
+            except Exception:
+                photo = None
+            for callback in self.waiting.pop(key, []):
+                callback(photo)
+        if self.waiting:
+            self.window.after(20, self._poll)
+        else:
+            self.polling = False
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Function to load an image scaled (and center-cropped) to the window size. The
+# scaled copy is cached on disk keyed by path, mtime and size, so the
+# full-resolution original is decoded only once.
+def load_background(path, size, cache_dir='thumbnail_cache'):
+    mtime = os.stat(path).st_mtime_ns
+    digest = hashlib.sha1(f"{os.path.abspath(path)}|{mtime}|{size[0]}x{size[1]}".encode('utf-8')).hexdigest()
+    cached_path = os.path.join(cache_dir, 'background-' + digest + '.png')
+    if os.path.exists(cached_path):
+        return Image.open(cached_path)
+    with Image.open(path) as img:
+        if img.format == 'JPEG':
+            img.draft('RGB', size)
+        scaled = ImageOps.fit(img.convert('RGB'), size)
+    os.makedirs(cache_dir, exist_ok=True)
+    scaled.save(cached_path)
+    return scaled
@@ -0,0 +1,40 @@
+# Validation shared by the data entry form and the bulk importer
+
+
+class ValidationError(ValueError):
+    pass
+
+
+# Function to check a listing's required fields and parse its price.
+# Returns the price as a float.
+def validate_listing(address, price, description, user_id):
+    if not address or not price or not description or not user_id:
+        raise ValidationError("All fields are required.")
+    try:
+        return float(price)
+    except (TypeError, ValueError):
+        raise ValidationError("Price must be a number.")
+
+
+# Function to parse a price range given as two values; an empty bound is open.
+# Returns (min_price, max_price) as floats.
+def validate_price_range(min_price, max_price):
+    try:
+        low = float(min_price) if str(min_price).strip() else 0.0
+        high = float(max_price) if str(max_price).strip() else float('inf')
+    except (TypeError, ValueError):
+        raise ValidationError("Please enter valid numbers for price range.")
+    return low, high
+
+
+# Function to parse a price range written as 'min-max'
+def parse_price_range(text):
+    if not text:
+        return 0.0, float('inf')
+    parts = text.split('-')
+    if len(parts) != 2:
+        raise ValidationError("Please enter a valid price range in the format 'min-max'.")
+    try:
+        return validate_price_range(*parts)
+    except ValidationError:
+        raise ValidationError("Please enter a valid price range in the format 'min-max'.")
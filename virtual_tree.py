@@ -0,0 +1,148 @@
+import tkinter as tk
+from array import array
+from bisect import bisect_left
+
+
+# Virtual list mode for a ttk.Treeview showing a whole table.
+#
+# Only the ids of the table are kept in memory (a compact array of integers);
+# the Treeview itself holds just the rows that are visible. Full rows are fetched
+# from SQLite in windows of the visible rows plus a buffer on each side, so
+# scrolling a few rows does not hit the database and scrolling far away costs a
+# single indexed "id BETWEEN" query. Single-row edits patch only that row.
+class VirtualTreeview:
+    def __init__(self, tree, scrollbar, conn, table='apartments', buffer=50):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.conn = conn
+        self.table = table
+        self.buffer = buffer
+        self.ids = array('q')
+        self.first = 0
+        self.window_start = 0
+        self.window_rows = []
+
+        scrollbar.config(command=self.yview)
+        tree.bind('<MouseWheel>', lambda event: self.yview('scroll', -1 if event.delta > 0 else 1, 'units'))
+        tree.bind('<Button-4>', lambda event: self.yview('scroll', -1, 'units'))
+        tree.bind('<Button-5>', lambda event: self.yview('scroll', 1, 'units'))
+
+    def visible_count(self):
+        return int(self.tree.cget('height'))
+
+    def _max_first(self):
+        return max(0, len(self.ids) - self.visible_count())
+
+    # Function to reload the id index and redraw
+    def reload(self):
+        self.set_ids(row[0] for row in self.conn.execute(f"SELECT id FROM {self.table} ORDER BY id"))
+
+    # Function to replace the id index with ids fetched elsewhere (e.g. on the DB worker)
+    def set_ids(self, ids):
+        self.ids = array('q', ids)
+        self.first = min(self.first, self._max_first())
+        self._invalidate_window()
+        self.render()
+
+    def _invalidate_window(self):
+        self.window_start = 0
+        self.window_rows = []
+
+    def _window_covers(self, start, end):
+        return self.window_start <= start and end <= self.window_start + len(self.window_rows)
+
+    def _fetch_window(self, start, end):
+        start = max(0, start - self.buffer)
+        end = min(len(self.ids), end + self.buffer)
+        if start >= end:
+            self.window_start, self.window_rows = start, []
+            return
+        self.window_rows = self.conn.execute(
+            f"SELECT * FROM {self.table} WHERE id BETWEEN ? AND ? ORDER BY id",
+            (self.ids[start], self.ids[end - 1])).fetchall()
+        self.window_start = start
+
+    # Function to draw the visible rows, fetching a new window if needed
+    def render(self):
+        end = min(len(self.ids), self.first + self.visible_count())
+        if not self._window_covers(self.first, end):
+            self._fetch_window(self.first, end)
+
+        selected = self.tree.selection()
+        self.tree.delete(*self.tree.get_children())
+        offset = self.first - self.window_start
+        for row in self.window_rows[offset:offset + end - self.first]:
+            self.tree.insert('', tk.END, iid=str(row[0]), values=row)
+        keep = [iid for iid in selected if self.tree.exists(iid)]
+        if keep:
+            self.tree.selection_set(keep)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.ids)
+        if total == 0:
+            self.scrollbar.set(0, 1)
+            return
+        self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible_count()) / total))
+
+    # Scrollbar command: handles both dragging ("moveto") and arrows/paging ("scroll")
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            first = int(float(args[1]) * len(self.ids))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.visible_count()
+            first = self.first + step
+        else:
+            return
+        first = max(0, min(first, self._max_first()))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def _position(self, row_id):
+        pos = bisect_left(self.ids, row_id)
+        if pos < len(self.ids) and self.ids[pos] == row_id:
+            return pos
+        return None
+
+    # Function to patch a single updated row in place; pass the row if it is
+    # already known to skip the query
+    def refresh_row(self, row_id, row=None):
+        row_id = int(row_id)
+        pos = self._position(row_id)
+        if pos is None:
+            return
+        offset = pos - self.window_start
+        if 0 <= offset < len(self.window_rows):
+            if row is None:
+                row = self.conn.execute(f"SELECT * FROM {self.table} WHERE id=?", (row_id,)).fetchone()
+            if row is None:
+                return
+            self.window_rows[offset] = row
+            if self.tree.exists(str(row_id)):
+                self.tree.item(str(row_id), values=row)
+
+    # Function to add a newly inserted row to the index
+    def insert_row(self, row_id):
+        row_id = int(row_id)
+        pos = bisect_left(self.ids, row_id)
+        self.ids.insert(pos, row_id)
+        if pos <= self.window_start + len(self.window_rows):
+            self._invalidate_window()
+        if pos < self.first + self.visible_count():
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    # Function to drop a deleted row from the index
+    def delete_row(self, row_id):
+        pos = self._position(int(row_id))
+        if pos is None:
+            return
+        del self.ids[pos]
+        if pos < self.window_start + len(self.window_rows):
+            self._invalidate_window()
+        self.first = min(self.first, self._max_first())
+        self.render()